@@ -1,7 +1,71 @@
 import streamlit as st
 import pandas as pd
-from housing_optimizer import HousingOptimizer
-from excel_processor import ExcelDataProcessor, create_example_excel
+from housing_optimizer import HousingOptimizer, SolverConfig
+from model_builder import SCORING_WEIGHTS
+from excel_processor import ExcelDataProcessor, WorkbookCache, create_example_excel
+from solution_cache import SolutionCache
+from solve_jobs import SolveQueue
+from pathlib import Path
+
+@st.cache_resource
+def get_workbook_cache() -> WorkbookCache:
+    """One parsed-workbook cache shared by every session on this server"""
+    return WorkbookCache()
+
+@st.cache_resource
+def get_solution_cache() -> SolutionCache:
+    """Solved layouts shared by every session, so toggling parameters back is instant"""
+    return SolutionCache(Path(get_workbook_cache().directory).parent / 'solutions')
+
+@st.cache_resource
+def get_solve_queue() -> SolveQueue:
+    """Background solves for every session; one at a time, the rest wait their turn"""
+    return SolveQueue(max_running=1)
+
+def show_run_stats(title: str, stats):
+    """Phase timings, model sizes and any profile of a load or solve"""
+    if stats is None:
+        return
+    with st.expander(f"{title} ({stats.total_seconds:.2f} s)"):
+        st.dataframe(stats.to_frame(), use_container_width=True)
+        if stats.counts:
+            st.dataframe(pd.DataFrame(list(stats.counts.items()), columns=['Item', 'Count']),
+                         use_container_width=True)
+        if stats.profile:
+            st.code(stats.profile)
+
+@st.fragment(run_every=1.0)
+def show_solve_job():
+    """Poll this session's solve job without re-running the whole page"""
+    job = get_solve_queue().get(st.session_state.get('solve_job'))
+    if job is None:
+        return
+    progress = job.progress()
+    if job.active:
+        waiting = sum(other.state == 'queued' and other.id < job.id
+                      for other in get_solve_queue().jobs())
+        cols = st.columns(4)
+        cols[0].metric("Elapsed", f"{progress.elapsed:.0f} s" if progress.state == 'running'
+                       else f"queued ({waiting} ahead)")
+        cols[1].metric("Best bound", "-" if progress.best_bound is None else f"{progress.best_bound:g}")
+        cols[2].metric("Incumbent", "-" if progress.incumbent is None else f"{progress.incumbent:g}")
+        cols[3].metric("Gap", "-" if progress.gap is None else f"{progress.gap:.1%}")
+        if st.button("⏹ Cancel"):
+            get_solve_queue().cancel(job.id)
+            st.rerun()
+        return
+
+    if job.id != st.session_state.get('applied_job'):
+        st.session_state['applied_job'] = job.id
+        job.apply()
+        st.rerun()  # redraw the whole tab with the new layout
+    if progress.state == 'done' and job.success:
+        st.success(f"Assignments generated in {progress.elapsed:.1f} s")
+        show_run_stats("Run statistics", job.stats)
+    elif progress.state == 'cancelled':
+        st.warning("Optimization cancelled")
+    else:
+        st.error(f"No feasible assignment found{': ' + job.error if job.error else ''}")
 
 def initialize_parameters():
     if 'parameters' not in st.session_state:
@@ -9,8 +73,11 @@ def initialize_parameters():
             'gender_separation': True,
             'leader_separation': True,
             'church_grouping': True,
-            'room_capacity': True
+            'room_capacity': True,
+            **SCORING_WEIGHTS
         }
+    if 'solver_config' not in st.session_state:
+        st.session_state.solver_config = SolverConfig()
 
 def customize_streamlit():
     # [Previous customize_streamlit code remains the same]
@@ -36,8 +103,20 @@ def main():
     
     # Upload Tab
     with tab1:
-        # [Previous upload tab code remains the same]
-        pass
+        uploaded_file = st.file_uploader("Upload conference workbook", type=['xlsx'])
+        # Only a new upload replaces the optimizer, so reruns keep solved assignments;
+        # re-uploading the same workbook is served from the workbook cache
+        if uploaded_file is not None and st.session_state.get('upload_id') != uploaded_file.file_id:
+            optimizer = HousingOptimizer()
+            optimizer.capture = st.session_state.get('capture')
+            optimizer.load_from_excel(uploaded_file, cache=get_workbook_cache())
+            st.session_state['optimizer'] = optimizer
+            st.session_state['upload_id'] = uploaded_file.file_id
+        if 'optimizer' in st.session_state:
+            optimizer = st.session_state['optimizer']
+            st.success(f"Loaded {len(optimizer.people)} participants, "
+                       f"{len(optimizer.rooms)} rooms in {len(optimizer.buildings)} buildings")
+            show_run_stats("Load statistics", optimizer.load_stats)
 
     # New Parameters Tab
     with tab2:
@@ -113,10 +192,94 @@ def main():
                 key='capacity_toggle'
             )
         
+        st.divider()
+
+        # Objective weights
+        st.markdown("### Scoring")
+        st.markdown("Among valid layouts, the optimizer picks the one with the lowest total penalty.")
+        parameters = st.session_state.parameters
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            parameters['room_weight'] = st.number_input(
+                "Penalty per room used", min_value=0.0, step=0.5,
+                value=float(parameters['room_weight']), key='room_weight'
+            )
+        with col2:
+            parameters['floor_split_weight'] = st.number_input(
+                "Penalty per floor a church uses", min_value=0.0, step=0.5,
+                value=float(parameters['floor_split_weight']), key='floor_split_weight',
+                disabled=not parameters['church_grouping']
+            )
+        with col3:
+            parameters['building_split_weight'] = st.number_input(
+                "Penalty per building a church uses", min_value=0.0, step=0.5,
+                value=float(parameters['building_split_weight']), key='building_split_weight',
+                disabled=not parameters['church_grouping']
+            )
+
+        st.divider()
+
+        # Solver settings
+        st.markdown("### Solver Settings")
+        solver_config = st.session_state.solver_config
+        col1, col2 = st.columns(2)
+        with col1:
+            solver_config.backend = st.selectbox(
+                "Solver",
+                options=['cbc', 'highs'],
+                index=['cbc', 'highs'].index(solver_config.backend),
+                format_func=lambda b: {'cbc': 'CBC (default)', 'highs': 'HiGHS'}[b],
+                key='solver_backend'
+            )
+            time_limit = st.number_input(
+                "Time limit (seconds, 0 = none)",
+                min_value=0,
+                value=int(solver_config.time_limit or 0),
+                help="When the limit is hit, the best assignment found so far is used",
+                key='solver_time_limit'
+            )
+            solver_config.time_limit = time_limit or None
+            gap = st.number_input(
+                "Accepted optimality gap (%)",
+                min_value=0.0,
+                max_value=100.0,
+                value=(solver_config.gap_rel or 0.0) * 100,
+                step=0.5,
+                key='solver_gap'
+            )
+            solver_config.gap_rel = gap / 100 if gap else None
+        with col2:
+            threads = st.number_input(
+                "Solver threads (0 = solver default)",
+                min_value=0,
+                value=solver_config.threads or 0,
+                key='solver_threads'
+            )
+            solver_config.threads = threads or None
+            solver_config.warm_start = st.toggle(
+                "Warm start from greedy assignment",
+                value=solver_config.warm_start,
+                key='solver_warm_start'
+            )
+            log_path = st.text_input(
+                "Solver log file (optional)",
+                value=solver_config.log_path or "",
+                key='solver_log_path'
+            )
+            solver_config.log_path = log_path or None
+            st.session_state.capture = st.selectbox(
+                "Profiling",
+                options=[None, 'tracemalloc', 'cprofile'],
+                format_func=lambda m: {None: 'Timings only', 'tracemalloc': 'Memory (tracemalloc)',
+                                       'cprofile': 'Functions (cProfile)'}[m],
+                help="Extra capture for the run statistics; both slow the run down",
+                key='capture_mode'
+            )
+
         # Display current parameter status
         st.markdown("### Current Configuration")
         status_df = pd.DataFrame([
-            {"Parameter": k, "Status": "Enabled" if v else "Disabled"} 
+            {"Parameter": k, "Status": ("Enabled" if v else "Disabled") if isinstance(v, bool) else f"{v:g}"}
             for k, v in st.session_state.parameters.items()
         ])
         st.dataframe(status_df, use_container_width=True)
@@ -142,13 +305,19 @@ def main():
             with st.expander("View Current Parameters"):
                 st.dataframe(status_df, use_container_width=True)
             
-            if st.button("🎯 Generate Assignments"):
-                with st.spinner("Optimizing room assignments..."):
-                    # Pass parameters to optimizer
-                    success = optimizer.optimize(parameters=st.session_state.parameters)
-                
-                # [Rest of assignments tab code remains the same]
-                pass
+            job = get_solve_queue().get(st.session_state.get('solve_job'))
+            running = job is not None and job.active
+            if st.button("🎯 Generate Assignments", disabled=running):
+                # Solve in a background worker so this session (and others) stay responsive
+                optimizer.capture = st.session_state.get('capture')
+                job = get_solve_queue().submit(optimizer,
+                                               parameters=dict(st.session_state.parameters),
+                                               solver_config=st.session_state.solver_config,
+                                               cache=get_solution_cache())
+                st.session_state['solve_job'] = job.id
+            show_solve_job()
+
+            # [Rest of assignments tab code remains the same]
         else:
             st.info("Please upload data in the Upload tab first")
 
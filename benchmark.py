@@ -0,0 +1,367 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from housing_optimizer import (HousingOptimizer, Person, Room, Building, SolverConfig,
+                               DEFAULT_PARAMETERS)
+from model_builder import ModelIndex, MilpModel
+
+
+def synthetic_optimizer(num_people: int, room_capacity: int = 4, buildings: int = 2,
+                        floors: int = 5, bed_slack: float = 0.25,
+                        num_churches: Optional[int] = None,
+                        capacity_mix: Optional[Dict[int, float]] = None,
+                        leader_ratio: float = 0.125, female_ratio: float = 0.5,
+                        seed: int = 0) -> HousingOptimizer:
+    """Optimizer filled with a synthetic event of num_people attendees
+
+    People are spread at random over num_churches churches (default: one
+    per ~8 people), with leader_ratio leaders and female_ratio women.
+    Rooms have room_capacity beds, or a capacity drawn per room from
+    capacity_mix ({capacity: share of rooms}), and are dealt round-robin
+    over buildings x floors until there are bed_slack spare beds. The same
+    seed always gives the same event.
+    """
+    rng = np.random.default_rng(seed)
+    optimizer = HousingOptimizer()
+    for b in range(1, buildings + 1):
+        optimizer.add_building(Building(id=f'B{b}', name=f'Hall {b}', floors=floors,
+                                        rooms_per_floor={}))
+
+    mix = capacity_mix or {room_capacity: 1.0}
+    capacities = np.array(list(mix), dtype=np.int64)
+    shares = np.array(list(mix.values()), dtype=float)
+    beds_needed = int(np.ceil(num_people * (1 + bed_slack)))
+    # Enough draws for the smallest rooms, cut back to the first that cover the beds
+    draws = rng.choice(capacities, size=beds_needed // max(1, capacities.min()) + 1,
+                       p=shares / shares.sum())
+    draws = draws[:int(np.searchsorted(np.cumsum(draws), beds_needed)) + 1]
+    places = [(f'B{b}', floor) for floor in range(1, floors + 1) for b in range(1, buildings + 1)]
+    numbers: Dict = {}
+    for k, capacity in enumerate(draws):
+        building_id, floor = places[k % len(places)]
+        number = numbers[building_id, floor] = numbers.get((building_id, floor), 0) + 1
+        room_id = f'{building_id}-{floor}-{str(number).zfill(3)}'
+        optimizer.rooms[room_id] = Room(id=room_id, building_id=building_id, floor=floor,
+                                        capacity=int(capacity))
+
+    num_churches = num_churches or max(1, num_people // 8)
+    church = rng.integers(num_churches, size=num_people)
+    is_leader = rng.random(num_people) < leader_ratio
+    is_female = rng.random(num_people) < female_ratio
+    for i in range(num_people):
+        optimizer.add_person(Person(id=f'P{str(i).zfill(5)}', name=f'Person {i}',
+                                    church_id=f'C{church[i] + 1}',
+                                    is_leader=bool(is_leader[i]),
+                                    gender='F' if is_female[i] else 'M'))
+    return optimizer
+
+
+def benchmark_build(sizes: List[int], formulations=('aggregated', 'pairwise'),
+                    pairwise_limit: int = 1000) -> pd.DataFrame:
+    """Time index and model construction (no solve) for each size and formulation"""
+    results: List[Dict] = []
+    for size in sizes:
+        optimizer = synthetic_optimizer(size)
+        for formulation in formulations:
+            if formulation == 'pairwise' and size > pairwise_limit:
+                continue
+            start = time.perf_counter()
+            index = ModelIndex(optimizer.people, optimizer.rooms, optimizer.buildings)
+            index_time = time.perf_counter() - start
+            model = MilpModel(index, DEFAULT_PARAMETERS, formulation)
+            build_time = time.perf_counter() - start
+            results.append({
+                'people': size,
+                'rooms': len(optimizer.rooms),
+                'formulation': formulation,
+                'variables': model.prob.numVariables(),
+                'constraints': model.prob.numConstraints(),
+                'index_seconds': round(index_time, 4),
+                'build_seconds': round(build_time, 3),
+            })
+            del model
+    return pd.DataFrame(results)
+
+
+def write_workbook(optimizer: HousingOptimizer, file_path: str):
+    """Write an optimizer's people, buildings and rooms as an input workbook"""
+    participants = pd.DataFrame({
+        'participant_id': [p.id for p in optimizer.people.values()],
+        'name': [p.name for p in optimizer.people.values()],
+        'church_id': [p.church_id for p in optimizer.people.values()],
+        'is_leader': [p.is_leader for p in optimizer.people.values()],
+        'gender': [p.gender for p in optimizer.people.values()],
+    })
+    buildings = pd.DataFrame({
+        'building_id': [b.id for b in optimizer.buildings.values()],
+        'name': [b.name for b in optimizer.buildings.values()],
+        'floors': [b.floors for b in optimizer.buildings.values()],
+    })
+    rooms = pd.DataFrame({
+        'room_id': [r.id for r in optimizer.rooms.values()],
+        'building_id': [r.building_id for r in optimizer.rooms.values()],
+        'floor': [r.floor for r in optimizer.rooms.values()],
+        'capacity': [r.capacity for r in optimizer.rooms.values()],
+    })
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        participants.to_excel(writer, sheet_name='Participants', index=False)
+        buildings.to_excel(writer, sheet_name='Buildings', index=False)
+        rooms.to_excel(writer, sheet_name='Rooms', index=False)
+
+
+def benchmark_load(rows: List[int], directory: str = '.') -> pd.DataFrame:
+    """Time HousingOptimizer.load_from_excel on generated workbooks of each size"""
+    results: List[Dict] = []
+    for size in rows:
+        file_path = str(Path(directory) / f'benchmark_{size}.xlsx')
+        write_workbook(synthetic_optimizer(size), file_path)
+        start = time.perf_counter()
+        optimizer = HousingOptimizer()
+        optimizer.load_from_excel(file_path)
+        results.append({
+            'participants': len(optimizer.people),
+            'rooms': len(optimizer.rooms),
+            'load_seconds': round(time.perf_counter() - start, 3),
+        })
+    return pd.DataFrame(results)
+
+
+# Engine and solver settings compared by benchmark_solve, each up to a size
+# beyond which its model no longer fits in a reasonable time or memory
+BENCHMARK_CONFIGS: Dict[str, Dict] = {
+    'greedy': {'engine': 'greedy'},
+    'room_class': {'engine': 'room_class', 'max_people': 10000},
+    'milp': {'engine': 'milp', 'max_people': 1000},
+    'milp_warm_start': {'engine': 'milp', 'warm_start': True, 'max_people': 1000},
+    'milp_pairwise': {'engine': 'milp', 'formulation': 'pairwise', 'max_people': 300},
+    'decomposed': {'engine': 'decomposed', 'max_people': 2000},
+}
+
+HISTORY_FIELDS = ['timestamp', 'commit', 'config', 'engine', 'formulation', 'people', 'rooms',
+                  'success', 'build_seconds', 'solve_seconds', 'total_seconds', 'variables',
+                  'constraints', 'peak_rss_mb', 'solver_peak_rss_mb', 'objective', 'rooms_used']
+
+
+def tier_event(num_people: int, seed: int = 0) -> HousingOptimizer:
+    """The synthetic event used for one size tier: five floors per building, a
+    building per 2000 people, churches of ~40 and a mix of double and
+    quad rooms"""
+    return synthetic_optimizer(num_people, buildings=max(2, num_people // 2000), floors=5,
+                               num_churches=max(1, num_people // 40),
+                               capacity_mix={2: 0.25, 4: 0.75}, seed=seed)
+
+
+def run_case(num_people: int, name: str, config: Dict, time_limit: Optional[float],
+             seed: int = 0) -> Dict:
+    """Generate one tier's event and solve it with one configuration"""
+    optimizer = tier_event(num_people, seed)
+    solver_config = SolverConfig(time_limit=time_limit, warm_start=config.get('warm_start', False),
+                                 msg=False)
+    success = optimizer.optimize(engine=config['engine'],
+                                 formulation=config.get('formulation', 'aggregated'),
+                                 solver_config=solver_config)
+    stats = optimizer.last_stats
+    names = [phase.name for phase in stats.phases]
+    solve_at = names.index('solve') if 'solve' in names else len(names)
+    solver_rss = [phase.peak_rss_mb for phase in stats.phases if phase.name == 'solve']
+    return {
+        'config': name,
+        'engine': config['engine'],
+        'formulation': config.get('formulation', 'aggregated'),
+        'people': len(optimizer.people),
+        'rooms': len(optimizer.rooms),
+        'success': success,
+        'build_seconds': round(sum(p.seconds for p in stats.phases[:solve_at]), 3),
+        'solve_seconds': round(sum(p.seconds for p in stats.phases[solve_at:solve_at + 1]), 3),
+        'total_seconds': round(stats.total_seconds, 3),
+        'variables': stats.counts.get('variables'),
+        'constraints': sum(v for k, v in stats.counts.items() if k.startswith('constraints')) or None,
+        'peak_rss_mb': max((p.peak_rss_mb for p in stats.phases if p.name != 'solve'
+                            and p.peak_rss_mb is not None), default=None),
+        'solver_peak_rss_mb': solver_rss[0] if solver_rss else None,
+        'objective': stats.objective,
+        'rooms_used': len(set(optimizer.assignments.values())) if success else None,
+    }
+
+
+def _case_worker(args, connection):
+    """Run one case in its own process group so a stuck solver can be killed with it"""
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    connection.send(run_case(*args))
+    connection.close()
+
+
+def run_isolated(num_people: int, name: str, config: Dict, time_limit: Optional[float],
+                 seed: int = 0, wall_limit: Optional[float] = None) -> Dict:
+    """run_case in a fresh worker process, killed after wall_limit seconds
+
+    CBC does not check its time limit during root processing of large
+    models, so the wall limit is what keeps a benchmark run bounded.
+    """
+    context = multiprocessing.get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_case_worker, args=((num_people, name, config, time_limit,
+                                                          seed), sender))
+    start = time.perf_counter()
+    process.start()
+    sender.close()
+    try:
+        if receiver.poll(wall_limit):
+            return receiver.recv()
+    except EOFError:
+        pass  # the worker died without a result
+    finally:
+        if process.is_alive():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                process.kill()
+        process.join()
+        receiver.close()
+    return {'config': name, 'engine': config['engine'],
+            'formulation': config.get('formulation', 'aggregated'), 'people': num_people,
+            'success': False, 'total_seconds': round(time.perf_counter() - start, 3)}
+
+
+def _commit() -> str:
+    """Short hash of the checked-out commit, or '' outside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=Path(__file__).parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return result.stdout.strip()
+
+
+def benchmark_solve(sizes: List[int], configs: Optional[List[str]] = None,
+                    time_limit: Optional[float] = 120, seed: int = 0,
+                    history_path: Optional[str] = None) -> pd.DataFrame:
+    """Solve every size tier with every configuration and record the results
+
+    Each case runs in a fresh worker process so its memory high-water mark
+    is its own, and is killed (recorded as unsuccessful) after twice the
+    solver time limit plus a minute. Configurations skip tiers above their
+    max_people. Results are appended to history_path (.csv, otherwise JSON
+    lines) when given.
+    """
+    wall_limit = None if time_limit is None else 2 * time_limit + 60
+    configs = configs or list(BENCHMARK_CONFIGS)
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    commit = _commit()
+    records: List[Dict] = []
+    for size in sizes:
+        for name in configs:
+            config = BENCHMARK_CONFIGS[name]
+            if size > config.get('max_people', float('inf')):
+                continue
+            record = run_isolated(size, name, config, time_limit, seed, wall_limit)
+            records.append({'timestamp': timestamp, 'commit': commit, **record})
+    if history_path:
+        append_history(records, history_path)
+    return pd.DataFrame(records, columns=HISTORY_FIELDS)
+
+
+def append_history(records: List[Dict], path: str):
+    """Append benchmark records to a CSV (by extension) or JSON-lines history file"""
+    path = Path(path)
+    if path.suffix == '.csv':
+        new_file = not path.exists()
+        with open(path, 'a', newline='') as history:
+            writer = csv.DictWriter(history, fieldnames=HISTORY_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, 'a') as history:
+            for record in records:
+                history.write(json.dumps(record) + '\n')
+
+
+def load_history(path: str) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == '.csv':
+        return pd.read_csv(path)
+    return pd.read_json(path, lines=True)
+
+
+def compare_history(history: pd.DataFrame) -> pd.DataFrame:
+    """Latest run of each (config, people) against the run before it
+
+    Ratios above 1 mean the latest run was slower or used more memory.
+    """
+    rows = []
+    for (config, people), runs in history.groupby(['config', 'people'], sort=True):
+        runs = runs.sort_values('timestamp')
+        if len(runs) < 2:
+            continue
+        previous, latest = runs.iloc[-2], runs.iloc[-1]
+        rows.append({
+            'config': config,
+            'people': people,
+            'previous': f"{previous['timestamp']} {previous['commit'] or ''}".strip(),
+            'total_seconds': latest['total_seconds'],
+            'time_ratio': round(latest['total_seconds'] / max(previous['total_seconds'], 1e-9), 2),
+            'memory_ratio': round(latest['peak_rss_mb'] / previous['peak_rss_mb'], 2)
+            if previous['peak_rss_mb'] else None,
+            'objective_change': None if pd.isna(latest['objective']) or pd.isna(previous['objective'])
+            else latest['objective'] - previous['objective'],
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Housing optimizer benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="time model construction")
+    build.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                       help="attendee counts to benchmark")
+    build.add_argument('--formulations', nargs='+', default=['aggregated', 'pairwise'],
+                       choices=['aggregated', 'pairwise'])
+
+    load = commands.add_parser('load', help="time Excel ingestion")
+    load.add_argument('--rows', type=int, nargs='+', default=[1000, 20000],
+                      help="participant rows per generated workbook")
+    load.add_argument('--directory', default=tempfile.gettempdir(),
+                      help="where the generated workbooks are written")
+
+    solve = commands.add_parser('solve', help="time every engine configuration per size tier")
+    solve.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                       help="attendee counts (size tiers) to benchmark")
+    solve.add_argument('--configs', nargs='+', default=list(BENCHMARK_CONFIGS),
+                       choices=list(BENCHMARK_CONFIGS))
+    solve.add_argument('--time-limit', type=float, default=120,
+                       help="solver time limit per case in seconds")
+    solve.add_argument('--seed', type=int, default=0)
+    solve.add_argument('--history', default='benchmark_history.csv',
+                       help="CSV or JSON-lines file the results are appended to")
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        print(benchmark_build(args.sizes, args.formulations).to_string(index=False))
+    elif args.command == 'load':
+        print(benchmark_load(args.rows, args.directory).to_string(index=False))
+    else:
+        results = benchmark_solve(args.sizes, args.configs, args.time_limit, args.seed,
+                                  args.history)
+        print(results.drop(columns=['timestamp', 'commit']).to_string(index=False))
+        comparison = compare_history(load_history(args.history))
+        if not comparison.empty:
+            print("\nAgainst the previous run:")
+            print(comparison.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
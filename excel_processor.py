@@ -1,8 +1,14 @@
 from dataclasses import dataclass
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import io
 import logging
+import os
+import shutil
 from pathlib import Path
+from openpyxl import load_workbook
+from run_stats import RunStats
 
 @dataclass
 class ExcelConfig:
@@ -33,9 +39,108 @@ class ExcelConfig:
         "capacity": int
     }
 
+    # Optional columns; blank cells mean "no restriction" / "no requirement"
+    OPTIONAL_PARTICIPANT_COLUMNS = {
+        "requirements": str,  # room tags the participant needs, e.g. "accessible"
+    }
+
+    OPTIONAL_ROOM_COLUMNS = {
+        "gender": str,  # reserve the room for "M" or "F"
+        "role": str,  # reserve the room for "leader" or "student"
+        "tags": str,  # room features, e.g. "accessible; ground floor"
+    }
+
+    TAG_SEPARATOR = r"[;,]"
+
+    BOOL_VALUES = {'yes': True, 'no': False, 'true': True, 'false': False,
+                   '1': True, '0': False, '1.0': True, '0.0': False, 'y': True, 'n': False}
+
+class WorkbookCache:
+    """Validated sheet frames stored as Arrow files, keyed by the workbook's content hash
+
+    Each entry is a directory holding one uncompressed Arrow IPC file per
+    sheet, so hits are read memory-mapped. Entries are touched on every hit
+    and the least recently used ones are evicted once the directory grows
+    past max_bytes.
+    """
+    FORMAT_VERSION = 1  # bump when the validated frames change shape
+    SHEETS = ("participants", "buildings", "rooms")
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 512 * 1024 * 1024):
+        if directory is None:
+            directory = os.environ.get("HOUSING_OPTIMIZER_CACHE_DIR",
+                                       Path.home() / ".cache" / "housing_optimizer" / "workbooks")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+
+    def key(self, data: bytes, config: ExcelConfig) -> str:
+        """Hash of the workbook bytes plus everything that shapes the validated frames"""
+        digest = hashlib.sha256(data)
+        digest.update(repr((self.FORMAT_VERSION, config.PARTICIPANTS_SHEET, config.BUILDINGS_SHEET,
+                            config.ROOMS_SHEET, config.PARTICIPANT_COLUMNS, config.BUILDING_COLUMNS,
+                            config.ROOM_COLUMNS, config.OPTIONAL_PARTICIPANT_COLUMNS,
+                            config.OPTIONAL_ROOM_COLUMNS)).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        """Cached frames for key, or None"""
+        from pyarrow import feather
+
+        entry = self.directory / key
+        if not entry.is_dir():
+            self.misses += 1
+            return None
+        try:
+            frames = tuple(feather.read_table(entry / f"{sheet}.arrow", memory_map=True).to_pandas()
+                           for sheet in self.SHEETS)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Discarding unreadable workbook cache entry {key}: {str(e)}")
+            shutil.rmtree(entry, ignore_errors=True)
+            self.misses += 1
+            return None
+        os.utime(entry)  # mark as recently used
+        self.hits += 1
+        return frames
+
+    def put(self, key: str, frames: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]):
+        """Store frames under key, then evict old entries beyond max_bytes"""
+        from pyarrow import feather
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = self.directory / f".{key}.{os.getpid()}.tmp"
+        staging.mkdir(exist_ok=True)
+        for sheet, df in zip(self.SHEETS, frames):
+            feather.write_feather(df, staging / f"{sheet}.arrow", compression="uncompressed")
+        try:
+            staging.rename(self.directory / key)
+        except OSError:
+            # Another process stored the same workbook first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for entry in self.directory.iterdir():
+            if entry.is_dir() and not entry.name.startswith("."):
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
 class ExcelDataProcessor:
-    def __init__(self, config: ExcelConfig = None):
+    def __init__(self, config: ExcelConfig = None, cache: Optional[WorkbookCache] = None,
+                 stats: Optional[RunStats] = None):
         self.config = config or ExcelConfig()
+        self.cache = cache
+        self.stats = stats if stats is not None else RunStats()  # read/validate phase timings
         self.logger = logging.getLogger(__name__)
 
     def validate_sheet_columns(self, df: pd.DataFrame, required_columns: Dict[str, type], sheet_name: str) -> bool:
@@ -45,46 +150,138 @@ class ExcelDataProcessor:
             self.logger.error(f"Missing required columns in {sheet_name}: {missing_columns}")
             return False
         
-        # Validate data types
+        # Validate data types, one vectorized conversion per column
         for col, expected_type in required_columns.items():
-            if expected_type == bool:
-                # Convert common boolean representations
-                df[col] = df[col].map({'Yes': True, 'No': False, True: True, False: False, 
-                                     1: True, 0: False, 'TRUE': True, 'FALSE': False})
             try:
-                df[col] = df[col].astype(expected_type)
+                if expected_type == bool:
+                    df[col] = self.coerce_bool_column(df[col])
+                elif expected_type == int:
+                    df[col] = pd.to_numeric(df[col], errors='raise').astype('int64')
+                elif expected_type == str:
+                    df[col] = self.coerce_str_column(df[col])
+                else:
+                    df[col] = df[col].astype(expected_type)
             except Exception as e:
                 self.logger.error(f"Error converting column {col} to {expected_type} in {sheet_name}: {str(e)}")
                 return False
         return True
 
+    def coerce_bool_column(self, column: pd.Series) -> pd.Series:
+        """Convert common boolean representations (Yes/No, TRUE/FALSE, 1/0) in one pass"""
+        if column.dtype == bool:
+            return column
+        normalised = column.astype(str).str.strip().str.lower()
+        converted = normalised.map(self.config.BOOL_VALUES)
+        unknown = converted.isna()
+        if unknown.any():
+            raise ValueError(f"unrecognised values {sorted(set(column[unknown].astype(str)))[:5]}")
+        return converted.astype(bool)
+
+    def coerce_str_column(self, column: pd.Series) -> pd.Series:
+        """Convert to str, writing whole numbers read as floats without a trailing .0"""
+        if pd.api.types.is_float_dtype(column) and (column.dropna() % 1 == 0).all():
+            column = column.astype('Int64')
+        return column.astype(str)
+
+    def fill_optional_columns(self, df: pd.DataFrame, optional_columns: Dict[str, type]):
+        """Add missing optional columns and normalise blanks to empty strings"""
+        for col in optional_columns:
+            if col not in df.columns:
+                df[col] = ""
+            df[col] = df[col].fillna("").astype(str).str.strip()
+
+    def split_tags(self, column: pd.Series) -> List[set]:
+        """Parse a column of separated tag cells into sets of lower-case tags"""
+        parts = column.str.lower().str.split(self.config.TAG_SEPARATOR, regex=True)
+        return [{tag.strip() for tag in tags if tag.strip()} for tags in parts]
+
+    def check_sheets(self, available: List[str], required: List[str]):
+        """Raise if any required sheet is missing from the workbook"""
+        missing_sheets = set(required) - set(available)
+        if missing_sheets:
+            raise ValueError(f"Missing required sheets: {missing_sheets}")
+
+    def read_sheets(self, file_path, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """Read whole sheets into DataFrames in one streaming pass per sheet
+
+        Uses python-calamine when it is installed, otherwise a read-only
+        openpyxl workbook whose rows are turned into columns directly.
+        """
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            python_calamine = None
+
+        if python_calamine is not None:
+            with pd.ExcelFile(file_path, engine='calamine') as xlsx:
+                self.check_sheets(xlsx.sheet_names, sheet_names)
+                return {name: pd.read_excel(xlsx, name) for name in sheet_names}
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            self.check_sheets(workbook.sheetnames, sheet_names)
+            frames = {}
+            for sheet_name in sheet_names:
+                rows = workbook[sheet_name].iter_rows(values_only=True)
+                header = next(rows, ())
+                # Skip fully blank rows, which formatted but empty cells produce
+                data = [row for row in rows if any(cell is not None for cell in row)]
+                columns = list(zip(*data)) if data else [()] * len(header)
+                frames[sheet_name] = pd.DataFrame({
+                    name: pd.Series(values) for name, values in zip(header, columns)
+                    if name is not None
+                })
+            return frames
+        finally:
+            workbook.close()
+
     def load_excel_data(self, file_path: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        """Load and validate data from Excel file"""
+        """Load and validate data from Excel file
+
+        With a WorkbookCache, a workbook whose bytes were seen before is
+        served from the cache without parsing. file_path may also be a
+        file-like object such as a Streamlit upload.
+        """
+        if self.cache is None:
+            return self.parse_excel_data(file_path)
+
+        with self.stats.phase('cache_lookup'):
+            if hasattr(file_path, "read"):
+                data = file_path.read()
+            else:
+                data = Path(file_path).read_bytes()
+            key = self.cache.key(data, self.config)
+            frames = self.cache.get(key)
+        if frames is None:
+            frames = self.parse_excel_data(io.BytesIO(data))
+            with self.stats.phase('cache_store'):
+                self.cache.put(key, frames)
+        return frames
+
+    def parse_excel_data(self, file_path) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Parse and validate the three sheets of a workbook"""
         try:
-            # Read all sheets
-            xlsx = pd.ExcelFile(file_path)
-            
-            # Verify all required sheets exist
+            # Read all required sheets (missing sheets raise here)
             required_sheets = [self.config.PARTICIPANTS_SHEET, 
                              self.config.BUILDINGS_SHEET, 
                              self.config.ROOMS_SHEET]
-            
-            missing_sheets = set(required_sheets) - set(xlsx.sheet_names)
-            if missing_sheets:
-                raise ValueError(f"Missing required sheets: {missing_sheets}")
-
-            # Load each sheet
-            participants_df = pd.read_excel(xlsx, self.config.PARTICIPANTS_SHEET)
-            buildings_df = pd.read_excel(xlsx, self.config.BUILDINGS_SHEET)
-            rooms_df = pd.read_excel(xlsx, self.config.ROOMS_SHEET)
+            with self.stats.phase('read'):
+                sheets = self.read_sheets(file_path, required_sheets)
+            participants_df = sheets[self.config.PARTICIPANTS_SHEET]
+            buildings_df = sheets[self.config.BUILDINGS_SHEET]
+            rooms_df = sheets[self.config.ROOMS_SHEET]
 
             # Validate each sheet
-            if not all([
-                self.validate_sheet_columns(participants_df, self.config.PARTICIPANT_COLUMNS, "Participants"),
-                self.validate_sheet_columns(buildings_df, self.config.BUILDING_COLUMNS, "Buildings"),
-                self.validate_sheet_columns(rooms_df, self.config.ROOM_COLUMNS, "Rooms")
-            ]):
-                raise ValueError("Data validation failed")
+            with self.stats.phase('validate'):
+                if not all([
+                    self.validate_sheet_columns(participants_df, self.config.PARTICIPANT_COLUMNS, "Participants"),
+                    self.validate_sheet_columns(buildings_df, self.config.BUILDING_COLUMNS, "Buildings"),
+                    self.validate_sheet_columns(rooms_df, self.config.ROOM_COLUMNS, "Rooms")
+                ]):
+                    raise ValueError("Data validation failed")
+
+                self.fill_optional_columns(participants_df, self.config.OPTIONAL_PARTICIPANT_COLUMNS)
+                self.fill_optional_columns(rooms_df, self.config.OPTIONAL_ROOM_COLUMNS)
 
             return participants_df, buildings_df, rooms_df
 
@@ -92,44 +289,53 @@ class ExcelDataProcessor:
             self.logger.error(f"Error loading Excel file: {str(e)}")
             raise
 
-    def process_data_for_optimizer(self, file_path: str) -> Dict:
-        """Process Excel data and return in format needed for HousingOptimizer"""
+    def load_entity_columns(self, file_path) -> Dict[str, Dict[str, list]]:
+        """Load and validate the workbook as plain column lists per entity
+
+        Keys match the Person/Building/Room field names, so callers can build
+        the dataclasses by zipping the columns without touching pandas rows.
+        """
         participants_df, buildings_df, rooms_df = self.load_excel_data(file_path)
-        
-        # Convert DataFrames to dictionary format needed by optimizer
-        processed_data = {
-            'people': {},
-            'buildings': {},
-            'rooms': {}
-        }
-        
-        # Process participants
-        for _, row in participants_df.iterrows():
-            processed_data['people'][row['participant_id']] = {
-                'id': row['participant_id'],
-                'name': row['name'],
-                'church_id': row['church_id'],
-                'is_leader': row['is_leader'],
-                'gender': row['gender']
-            }
-        
-        # Process buildings
-        for _, row in buildings_df.iterrows():
-            processed_data['buildings'][row['building_id']] = {
-                'id': row['building_id'],
-                'name': row['name'],
-                'floors': row['floors']
+        self.stats.count('participants', len(participants_df))
+        self.stats.count('rooms', len(rooms_df))
+        with self.stats.phase('columns'):
+            columns = {
+                'people': {
+                    'id': participants_df['participant_id'].tolist(),
+                    'name': participants_df['name'].tolist(),
+                    'church_id': participants_df['church_id'].tolist(),
+                    'is_leader': participants_df['is_leader'].tolist(),
+                    'gender': participants_df['gender'].tolist(),
+                    'requirements': self.split_tags(participants_df['requirements'])
+                },
+                'buildings': {
+                    'id': buildings_df['building_id'].tolist(),
+                    'name': buildings_df['name'].tolist(),
+                    'floors': buildings_df['floors'].tolist()
+                },
+                'rooms': {
+                    'id': rooms_df['room_id'].tolist(),
+                    'building_id': rooms_df['building_id'].tolist(),
+                    'floor': rooms_df['floor'].tolist(),
+                    'capacity': rooms_df['capacity'].tolist(),
+                    'gender': rooms_df['gender'].replace('', None).tolist(),
+                    'role': rooms_df['role'].str.lower().replace('', None).tolist(),
+                    'tags': self.split_tags(rooms_df['tags'])
+                }
             }
-        
-        # Process rooms
-        for _, row in rooms_df.iterrows():
-            processed_data['rooms'][row['room_id']] = {
-                'id': row['room_id'],
-                'building_id': row['building_id'],
-                'floor': row['floor'],
-                'capacity': row['capacity']
+        return columns
+
+    def process_data_for_optimizer(self, file_path: str) -> Dict:
+        """Process Excel data and return in format needed for HousingOptimizer"""
+        columns = self.load_entity_columns(file_path)
+
+        # Convert columns to dictionary format keyed by id
+        processed_data = {}
+        for entity, entity_columns in columns.items():
+            names = list(entity_columns)
+            processed_data[entity] = {
+                values[0]: dict(zip(names, values)) for values in zip(*entity_columns.values())
             }
-        
         return processed_data
 
 def create_example_excel(output_path: str):
@@ -141,7 +347,8 @@ def create_example_excel(output_path: str):
             'name': ['John Doe', 'Jane Smith', 'Bob Johnson'],
             'church_id': ['C1', 'C1', 'C2'],
             'is_leader': [False, True, False],
-            'gender': ['M', 'F', 'M']
+            'gender': ['M', 'F', 'M'],
+            'requirements': ['', '', 'accessible']
         }
         pd.DataFrame(participants_data).to_excel(writer, sheet_name='Participants', index=False)
 
@@ -158,6 +365,9 @@ def create_example_excel(output_path: str):
             'room_id': ['B1-1-101', 'B1-1-102', 'B1-2-201'],
             'building_id': ['B1', 'B1', 'B1'],
             'floor': [1, 1, 2],
-            'capacity': [2, 2, 2]
+            'capacity': [2, 2, 2],
+            'gender': ['', 'F', ''],
+            'role': ['', '', ''],
+            'tags': ['accessible', '', '']
         }
         pd.DataFrame(rooms_data).to_excel(writer, sheet_name='Rooms', index=False) 
\ No newline at end of file
@@ -1,8 +1,61 @@
-from dataclasses import dataclass
-from typing import List, Dict, Set
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Set, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+import logging
 from pulp import *
 import pandas as pd
-from excel_processor import ExcelDataProcessor
+from excel_processor import ExcelDataProcessor, WorkbookCache
+from model_builder import ModelIndex, MilpModel, SCORING_WEIGHTS, scoring_weights
+from solution_cache import SolutionCache, fingerprint
+from run_stats import RunStats
+
+DEFAULT_PARAMETERS = {
+    'gender_separation': True,
+    'leader_separation': True,
+    'church_grouping': True,
+    'room_capacity': True,
+    **SCORING_WEIGHTS
+}
+
+@dataclass
+class SolverConfig:
+    """Solver backend and limits used for every MILP solve"""
+    backend: str = 'cbc'  # 'cbc' or 'highs'
+    time_limit: Optional[float] = None  # seconds; the best incumbent is kept when it is hit
+    # Accepted relative MIP gap. The scoring objective's bound is rarely tight
+    # (room parity is invisible to the LP), so proving the exact optimum can
+    # take far longer than finding it; 0 or None asks for the proof anyway.
+    gap_rel: Optional[float] = 0.02
+    threads: Optional[int] = None
+    warm_start: bool = False  # seed the solver with the greedy assignment
+    log_path: Optional[str] = None
+    msg: bool = True
+
+    def create_solver(self):
+        """Build the PuLP solver object for this configuration"""
+        if self.backend == 'cbc':
+            return PULP_CBC_CMD(msg=self.msg, timeLimit=self.time_limit, gapRel=self.gap_rel,
+                                threads=self.threads, warmStart=self.warm_start,
+                                logPath=self.log_path)
+        if self.backend == 'highs':
+            solver = HiGHS_CMD(msg=self.msg, timeLimit=self.time_limit, gapRel=self.gap_rel,
+                               threads=self.threads, warmStart=self.warm_start,
+                               logPath=self.log_path)
+            if solver.available():
+                return solver
+            # The highspy bindings take no log file or MIP start
+            solver = HiGHS(msg=self.msg, timeLimit=self.time_limit, gapRel=self.gap_rel,
+                           threads=self.threads)
+            if solver.available():
+                return solver
+            raise RuntimeError("HiGHS solver is not available; install highspy or the highs binary")
+        raise ValueError(f"Unknown solver backend: {self.backend}")
+
+
+def _solution_found(prob: LpProblem) -> bool:
+    """True for proven optima and for feasible incumbents of time- or gap-limited solves"""
+    return (LpStatus[prob.status] == 'Optimal'
+            or prob.sol_status in (LpSolutionOptimal, LpSolutionIntegerFeasible))
 
 @dataclass
 class Person:
@@ -11,6 +64,7 @@ class Person:
     church_id: str
     is_leader: bool
     gender: str
+    requirements: Set[str] = field(default_factory=set)  # room tags this person needs
 
 @dataclass
 class Room:
@@ -19,6 +73,16 @@ class Room:
     floor: int
     capacity: int
     current_occupants: List[str] = None
+    gender: Optional[str] = None  # reserved for one gender, if set
+    role: Optional[str] = None  # reserved for 'leader' or 'student', if set
+    tags: Set[str] = field(default_factory=set)  # features such as 'accessible'
+
+    def accepts(self, person: Person) -> bool:
+        """Whether the person may be placed here at all, whatever else is in the room"""
+        return (self.capacity > 0
+                and (not self.gender or self.gender == person.gender)
+                and (not self.role or self.role == ('leader' if person.is_leader else 'student'))
+                and person.requirements <= self.tags)
 
 @dataclass
 class Building:
@@ -33,107 +97,581 @@ class HousingOptimizer:
         self.rooms: Dict[str, Room] = {}
         self.buildings: Dict[str, Building] = {}
         self.assignments: Dict[str, str] = {}  # person_id -> room_id
+        self.parameters = dict(DEFAULT_PARAMETERS)  # parameters of the last optimize()
+        self.solver_config = SolverConfig()  # solver settings of the last optimize()
+        self.capture: Optional[str] = None  # RunStats capture mode: 'tracemalloc' or 'cprofile'
+        self.load_stats: Optional[RunStats] = None  # phases of the last load_from_excel()
+        self.last_stats: Optional[RunStats] = None  # phases of the last optimize()
+        self.logger = logging.getLogger(__name__)
+
+    def add_person(self, person: Person, incremental: bool = False):
+        """Add or update a person in the system
 
-    def add_person(self, person: Person):
-        """Add or update a person in the system"""
+        With incremental and an existing layout, the person is placed by a
+        local repair solve instead of waiting for the next full optimize().
+        """
+        if incremental and self.assignments:
+            return self.apply_changes(adds=[person])
         self.people[person.id] = person
 
-    def remove_person(self, person_id: str):
-        """Remove a person (e.g., dropout) and trigger reoptimization"""
+    def remove_person(self, person_id: str, incremental: bool = True):
+        """Remove a person (e.g., dropout) and trigger reoptimization
+
+        Incremental removal only frees the person's bed and leaves everyone
+        else in place; otherwise the whole model is re-solved.
+        """
+        if incremental:
+            return self.apply_changes(removes=[person_id])
         if person_id in self.people:
             del self.people[person_id]
             if person_id in self.assignments:
                 del self.assignments[person_id]
-                self.optimize()
+                self.optimize(parameters=self.parameters, solver_config=self.solver_config)
+
+    def apply_changes(self, adds: List[Person] = (), removes: List[str] = ()) -> bool:
+        """Apply a batch of late registrations and dropouts to the current layout
+
+        Existing assignments stay fixed. Dropouts free their beds and all
+        added (or updated) people are placed by one small repair solve over
+        the rooms that can still take them.
+        """
+        for p_id in removes:
+            self.people.pop(p_id, None)
+            self.assignments.pop(p_id, None)
+        for person in adds:
+            self.people[person.id] = person
+            self.assignments.pop(person.id, None)
+
+        unplaced = [person.id for person in adds]
+        if not unplaced:
+            return True
+        return self._repair(unplaced, self.parameters)
 
     def add_building(self, building: Building):
         """Add a building to the system"""
         self.buildings[building.id] = building
 
-    def optimize(self, parameters=None) -> bool:
-        """Run the main optimization algorithm with optional parameter controls"""
+    def optimize(self, parameters=None, formulation: str = 'aggregated',
+                 engine: str = 'milp', solver_config: Optional[SolverConfig] = None,
+                 fallback: bool = False, workers: Optional[int] = None,
+                 cache: Optional[SolutionCache] = None) -> bool:
+        """Run the main optimization algorithm with optional parameter controls
+
+        formulation selects how gender and leader separation are modelled:
+        'aggregated' adds one room-type indicator per room and caps each
+        group's occupancy through it (linear in people + rooms), 'pairwise'
+        keeps the original x[a, r] + x[b, r] <= 1 row for every conflicting pair.
+
+        engine selects the model: 'milp' assigns each person to a room
+        directly, 'room_class' solves over head counts per class of
+        interchangeable rooms and expands them into room ids afterwards,
+        'greedy' runs the first-fit heuristic only (no solver), 'decomposed'
+        splits the event into independent (segment, building) blocks and
+        solves them in parallel on up to `workers` processes.
+
+        solver_config picks the backend, time limit, gap, threads and log
+        file; with its warm_start the greedy assignment is handed to the
+        solver as a MIP start. A solve stopped by the time limit keeps its best
+        feasible incumbent. With fallback, a MILP that finds no solution at all
+        falls back to the greedy assignment instead of leaving the layout empty.
+
+        With a SolutionCache, an identical request (same people, rooms,
+        buildings and settings) returns the cached layout without solving,
+        and a MILP for the same dataset under other settings starts from
+        the most recent cached layout.
+
+        Per-phase timings, memory and model sizes are logged and kept in
+        self.last_stats.
+        """
+        if formulation not in ('aggregated', 'pairwise'):
+            raise ValueError(f"Unknown formulation: {formulation}")
+        if engine not in ('milp', 'room_class', 'greedy', 'decomposed'):
+            raise ValueError(f"Unknown engine: {engine}")
+
         if parameters is None:
-            parameters = {
-                'gender_separation': True,
-                'leader_separation': True,
-                'church_grouping': True,
-                'room_capacity': True
-            }
-            
-        # Create the optimization problem
-        prob = LpProblem("Conference_Housing_Assignment", LpMinimize)
-
-        # Decision variables: 1 if person i is assigned to room j, 0 otherwise
-        x = LpVariable.dicts("assign",
-                           ((p, r) for p in self.people.keys() 
-                            for r in self.rooms.keys()),
-                           cat='Binary')
-
-        # Objective: Minimize room usage (can be modified later for other objectives)
-        prob += lpSum(x[p, r] for p in self.people.keys() 
-                     for r in self.rooms.keys())
-
-        # Constraints
-        # 1. Each person must be assigned to exactly one room
-        for p_id in self.people.keys():
-            prob += lpSum(x[p_id, r] for r in self.rooms.keys()) == 1
-
-        # 2. Room capacity constraints (if enabled)
-        if parameters['room_capacity']:
-            for r_id, room in self.rooms.items():
-                prob += lpSum(x[p_id, r_id] for p_id in self.people.keys()) <= room.capacity
-
-        # 3. Gender separation constraints (if enabled)
-        if parameters['gender_separation']:
-            for r_id in self.rooms.keys():
-                males = [p_id for p_id, p in self.people.items() if p.gender == 'M']
-                females = [p_id for p_id, p in self.people.items() if p.gender == 'F']
-                
-                # If there's anyone of one gender in a room, there can't be anyone of the other gender
-                for m in males:
-                    for f in females:
-                        prob += x[m, r_id] + x[f, r_id] <= 1
-
-        # 4. Leader/Student separation (if enabled)
-        if parameters['leader_separation']:
-            for r_id in self.rooms.keys():
-                leaders = [p_id for p_id, p in self.people.items() if p.is_leader]
-                students = [p_id for p_id, p in self.people.items() if not p.is_leader]
-                
-                # If there's a leader in a room, there can't be any students
-                for l in leaders:
-                    for s in students:
-                        prob += x[l, r_id] + x[s, r_id] <= 1
-
-        # 5. Church grouping preference (if enabled)
-        if parameters['church_grouping']:
-            # Add soft constraints to encourage same-church grouping
-            for church_id in set(p.church_id for p in self.people.values()):
-                church_members = [p_id for p_id, p in self.people.items() 
-                                if p.church_id == church_id]
-                # Try to keep church members in same or adjacent rooms
-                for building in self.buildings.values():
-                    for floor in range(1, building.floors + 1):
-                        floor_rooms = [r_id for r_id, r in self.rooms.items() 
-                                     if r.building_id == building.id and r.floor == floor]
-                        if floor_rooms:
-                            # Encourage at least some church members on each floor
-                            prob += lpSum(x[m, r] for m in church_members 
-                                       for r in floor_rooms) >= 1
+            parameters = dict(DEFAULT_PARAMETERS)
+        if solver_config is None:
+            solver_config = SolverConfig()
+        self.parameters = parameters
+        self.solver_config = solver_config
+
+        self.last_stats = RunStats(capture=self.capture)
+        with self.last_stats.run():
+            success = self._run_engine(parameters, formulation, engine, solver_config, fallback,
+                                       workers, cache)
+        self.last_stats.log(self.logger, f"optimize(engine={engine})")
+        return success
+
+    def _run_engine(self, parameters, formulation: str, engine: str, solver_config: SolverConfig,
+                    fallback: bool, workers: Optional[int], cache: Optional[SolutionCache]) -> bool:
+        """Serve optimize() from the cache or dispatch it to the chosen engine"""
+        start = None
+        if cache is not None:
+            with self.last_stats.phase('cache_lookup'):
+                dataset_key = self.dataset_fingerprint()
+                key = self.solve_fingerprint(dataset_key, parameters, formulation, engine,
+                                             solver_config)
+                cached = cache.get(key)
+            if cached is not None:
+                self.assignments = cached
+                return True
+            start = cache.nearest(dataset_key)
+
+        if engine == 'room_class':
+            success = self._optimize_room_classes(parameters, solver_config)
+        elif engine == 'greedy':
+            success = self._optimize_greedy(parameters)
+        elif engine == 'decomposed':
+            success = self._optimize_decomposed(parameters, formulation, solver_config, workers)
+        else:
+            success = self._optimize_milp(parameters, formulation, solver_config, fallback, start)
+
+        if success and cache is not None:
+            cache.put(key, dataset_key, self.assignments)
+        return success
+
+    def dataset_fingerprint(self) -> str:
+        """Stable hash of everything about people, rooms and buildings that affects a solve"""
+        return fingerprint(
+            sorted((p.id, p.church_id, bool(p.is_leader), p.gender, p.requirements)
+                   for p in self.people.values()),
+            sorted((r.id, r.building_id, r.floor, r.capacity, r.gender, r.role, r.tags)
+                   for r in self.rooms.values()),
+            sorted((b.id, b.floors) for b in self.buildings.values()))
+
+    def solve_fingerprint(self, dataset_key: str, parameters, formulation: str, engine: str,
+                          solver_config: SolverConfig) -> str:
+        """Hash of a dataset plus every setting that can change the layout it solves to"""
+        solver = (solver_config.backend, solver_config.time_limit, solver_config.gap_rel)
+        return fingerprint(dataset_key, parameters, formulation, engine, solver)
+
+    def _optimize_milp(self, parameters, formulation: str, solver_config: SolverConfig,
+                       fallback: bool, start: Optional[Dict[str, str]] = None) -> bool:
+        """Build the person x room MILP from precomputed index arrays and solve it
+
+        start, if given, is handed to the solver as a MIP start.
+        """
+        stats = self.last_stats
+        with stats.phase('index'):
+            index = ModelIndex(self.people, self.rooms, self.buildings)
+        model = MilpModel(index, parameters, formulation, stats=stats)
+
+        # Seed the solver with the greedy layout so it starts from a good incumbent
+        if start is None and solver_config.warm_start:
+            with stats.phase('greedy'):
+                start = self._greedy_assignments(parameters)
+        if start is not None:
+            with stats.phase('warm_start'):
+                model.set_initial_values(start)
 
         # Solve the problem
-        status = prob.solve()
+        with stats.phase('solve', solver=True):
+            model.prob.solve(replace(solver_config, warm_start=start is not None).create_solver())
 
-        if LpStatus[prob.status] == 'Optimal':
-            # Update assignments
-            self.assignments = {}
-            for p_id in self.people.keys():
-                for r_id in self.rooms.keys():
-                    if value(x[p_id, r_id]) > 0.5:  # Using 0.5 as threshold for binary variables
-                        self.assignments[p_id] = r_id
+        if _solution_found(model.prob):
+            stats.objective = value(model.prob.objective)
+            with stats.phase('extract'):
+                self.assignments = model.extract_assignments()
             return True
+        if fallback:
+            return self._optimize_greedy(parameters)
         return False
 
+    def _segment_key(self, person: Person, parameters) -> Tuple:
+        """Key of the people who may share a room under the separation rules"""
+        return (person.gender if parameters['gender_separation'] else None,
+                person.is_leader if parameters['leader_separation'] else None)
+
+    def _profile(self, person: Person) -> Tuple:
+        """Everything Room.accepts looks at, so equal profiles are interchangeable"""
+        return (person.gender, person.is_leader, frozenset(person.requirements))
+
+    def _room_classes(self) -> Dict[Tuple, List[str]]:
+        """Group interchangeable rooms by (building, floor, capacity, eligibility)"""
+        classes: Dict[Tuple, List[str]] = {}
+        for r_id in sorted(self.rooms):
+            room = self.rooms[r_id]
+            key = (room.building_id, room.floor, room.capacity, room.gender, room.role,
+                   frozenset(room.tags))
+            classes.setdefault(key, []).append(r_id)
+        return classes
+
+    def _optimize_room_classes(self, parameters, solver_config: SolverConfig) -> bool:
+        """Solve over counts per (church, segment) x room class instead of per
+        person x room, which removes the symmetry between identical rooms"""
+        stats = self.last_stats
+        with stats.phase('model'):
+            classes = self._room_classes()
+            class_keys = list(classes.keys())
+
+            # Groups of people that are interchangeable for the model
+            groups: Dict[Tuple, List[str]] = {}
+            for p_id in sorted(self.people):
+                person = self.people[p_id]
+                key = (person.church_id, self._segment_key(person, parameters), self._profile(person))
+                groups.setdefault(key, []).append(p_id)
+            segments = sorted(set(g[1] for g in groups), key=str)
+            group_keys = list(groups.keys())
+
+            # Only (group, class) pairs whose rooms accept the group's people
+            pairs = [(g, k) for g, key in enumerate(group_keys) for k, class_key in enumerate(class_keys)
+                     if self.rooms[classes[class_key][0]].accepts(self.people[groups[key][0]])]
+
+            prob = LpProblem("Conference_Housing_Room_Classes", LpMinimize)
+            # Number of people of group g placed in room class k
+            n = LpVariable.dicts("count", pairs, lowBound=0, cat='Integer')
+            # Number of rooms of class k given to segment s
+            u = LpVariable.dicts("rooms",
+                                 ((s, k) for s in range(len(segments)) for k in range(len(class_keys))),
+                                 lowBound=0, cat='Integer')
+
+            weights = scoring_weights(parameters)
+            objective = [(var, weights['room_weight']) for var in u.values()]
+
+            # 1. Everyone in each group is placed
+            for g, key in enumerate(group_keys):
+                prob += lpSum(n[g, k] for k in range(len(class_keys)) if (g, k) in n) == len(groups[key])
+
+            for k, class_key in enumerate(class_keys):
+                # 2. A class cannot hand out more rooms than it has
+                prob += lpSum(u[s, k] for s in range(len(segments))) <= len(classes[class_key])
+                # 3. Each segment fits into the rooms it was given in this class
+                limit = class_key[2] if parameters['room_capacity'] else len(self.people)
+                for s, segment in enumerate(segments):
+                    prob += (lpSum(n[g, k] for g, key in enumerate(group_keys)
+                                   if key[1] == segment and (g, k) in n)
+                             <= limit * u[s, k])
+
+            # 4. Church grouping: penalise every floor and building a church occupies
+            if parameters['church_grouping']:
+                areas: Dict[Tuple, List[int]] = {}
+                for k, class_key in enumerate(class_keys):
+                    areas.setdefault(('floor',) + class_key[:2], []).append(k)
+                    areas.setdefault(('building', class_key[0]), []).append(k)
+                churches: Dict[str, List[int]] = {}
+                for g, key in enumerate(group_keys):
+                    churches.setdefault(key[0], []).append(g)
+                for c, church_groups in enumerate(churches.values()):
+                    size = sum(len(groups[group_keys[g]]) for g in church_groups)
+                    for a, (area, area_classes) in enumerate(areas.items()):
+                        weight = weights[f'{area[0]}_split_weight']
+                        counts = [n[g, k] for g in church_groups for k in area_classes
+                                  if (g, k) in n]
+                        if not weight or not counts:
+                            continue
+                        present = LpVariable(f"church_{c}_{a}", cat=LpBinary)
+                        prob += lpSum(counts) <= size * present
+                        objective.append((present, weight))
+
+            prob += LpAffineExpression(objective)
+        stats.count('variables', prob.numVariables())
+        stats.count('constraints', prob.numConstraints())
+
+        with stats.phase('solve', solver=True):
+            prob.solve(replace(solver_config, warm_start=False).create_solver())
+        if not _solution_found(prob):
+            return False
+        stats.objective = value(prob.objective)
+
+        # Expand counts into concrete rooms: each segment takes its share of the
+        # class's rooms and fills them in church order so groups stay together
+        with stats.phase('expand'):
+            self.assignments = {}
+            remaining = {key: list(members) for key, members in groups.items()}
+            for k, class_key in enumerate(class_keys):
+                free_rooms = iter(classes[class_key])
+                for s, segment in enumerate(segments):
+                    room_count = int(round(value(u[s, k])))
+                    placed = []
+                    for g, key in enumerate(group_keys):
+                        if key[1] == segment and (g, k) in n:
+                            count = int(round(value(n[g, k])))
+                            placed.extend(remaining[key][:count])
+                            del remaining[key][:count]
+                    if not placed:
+                        continue
+                    per_room = -(-len(placed) // room_count)  # ceil
+                    for start in range(0, len(placed), per_room):
+                        r_id = next(free_rooms)
+                        for p_id in placed[start:start + per_room]:
+                            self.assignments[p_id] = r_id
+        return True
+
+    def _greedy_assignments(self, parameters) -> Optional[Dict[str, str]]:
+        """First-fit-decreasing heuristic: bucket people by segment and church,
+        then fill rooms in building/floor order, largest buckets first. Each
+        room is claimed by one segment so the separation rules always hold.
+        Church grouping is only approximated by keeping buckets contiguous.
+        Returns None when the rooms run out before everyone is placed."""
+        buckets: Dict[Tuple, Dict[str, List[str]]] = {}
+        for p_id in sorted(self.people):
+            person = self.people[p_id]
+            segment = buckets.setdefault(self._segment_key(person, parameters), {})
+            segment.setdefault(person.church_id, []).append(p_id)
+
+        # Rooms grouped by building and floor, largest rooms first on each floor
+        rooms = sorted((r for r in self.rooms.values() if r.capacity > 0),
+                       key=lambda r: (r.building_id, r.floor, -r.capacity, r.id))
+        used = [False] * len(rooms)
+
+        assignments: Dict[str, str] = {}
+        by_size = sorted(buckets.values(), key=lambda churches: -sum(map(len, churches.values())))
+        for churches in by_size:
+            # Rooms this segment has opened and not yet filled, as [room, spare beds];
+            # without reserved rooms there is never more than one
+            open_rooms: List[List] = []
+            # Next room to look at per eligibility profile within the segment
+            cursors: Dict[Tuple, int] = {}
+            for church_id in sorted(churches, key=lambda c: -len(churches[c])):
+                for p_id in churches[church_id]:
+                    person = self.people[p_id]
+                    slot = next((slot for slot in open_rooms if slot[0].accepts(person)), None)
+                    if slot is None:
+                        profile = self._profile(person)
+                        cursor = cursors.get(profile, 0)
+                        while cursor < len(rooms) and (used[cursor] or not rooms[cursor].accepts(person)):
+                            cursor += 1
+                        if cursor == len(rooms):
+                            return None
+                        used[cursor] = True
+                        cursors[profile] = cursor + 1
+                        slot = [rooms[cursor], rooms[cursor].capacity]
+                        open_rooms.append(slot)
+                    assignments[p_id] = slot[0].id
+                    slot[1] -= 1
+                    if slot[1] == 0:
+                        open_rooms.remove(slot)
+        return assignments
+
+    def _optimize_greedy(self, parameters) -> bool:
+        """Assign everyone with the greedy heuristic, without a solver"""
+        with self.last_stats.phase('greedy'):
+            assignments = self._greedy_assignments(parameters)
+        if assignments is None:
+            return False
+        self.assignments = assignments
+        return True
+
+    def _allocate_rooms(self, parameters, slack: float = 0.1) -> Optional[Dict[Tuple, List[str]]]:
+        """Decide up front which rooms each segment gets
+
+        Segments are served largest first, each taking a contiguous run of
+        rooms in building/floor order until its beds cover its head count
+        plus `slack`. Falls back to no slack when the venue is too tight and
+        returns None if even that does not fit.
+        """
+        segments: Dict[Tuple, int] = {}
+        # One representative person per eligibility profile of each segment
+        profiles: Dict[Tuple, Dict[Tuple, Person]] = {}
+        for person in self.people.values():
+            key = self._segment_key(person, parameters)
+            segments[key] = segments.get(key, 0) + 1
+            profiles.setdefault(key, {}).setdefault(self._profile(person), person)
+        rooms = sorted((r for r in self.rooms.values() if r.capacity > 0),
+                       key=lambda r: (r.building_id, r.floor, r.id))
+
+        for margin in (slack, 0.0):
+            allocation: Dict[Tuple, List[str]] = {}
+            used = set()
+            for key in sorted(segments, key=lambda k: -segments[k]):
+                target, beds = segments[key] * (1 + margin), 0
+                allocation[key] = []
+                for room in rooms:
+                    if beds >= target:
+                        break
+                    # Skip rooms reserved for people outside this segment
+                    if room.id in used or not any(room.accepts(p) for p in profiles[key].values()):
+                        continue
+                    used.add(room.id)
+                    allocation[key].append(room.id)
+                    beds += room.capacity
+                if beds < segments[key]:
+                    break
+            else:
+                return allocation
+        return None
+
+    def _decompose(self, parameters) -> Optional[List[Tuple[List[Person], List[Room]]]]:
+        """Partition people and rooms into independent (segment, building) blocks
+
+        Within a segment, people are ordered by church (largest first) and
+        shared between the segment's buildings in proportion to their beds.
+        """
+        allocation = self._allocate_rooms(parameters)
+        if allocation is None:
+            return None
+
+        blocks = []
+        for key, room_ids in allocation.items():
+            members = [p for p in self.people.values() if self._segment_key(p, parameters) == key]
+            church_sizes: Dict[str, int] = {}
+            for person in members:
+                church_sizes[person.church_id] = church_sizes.get(person.church_id, 0) + 1
+            members.sort(key=lambda p: (-church_sizes[p.church_id], p.church_id, p.id))
+
+            by_building: Dict[str, List[Room]] = {}
+            for r_id in room_ids:
+                room = self.rooms[r_id]
+                by_building.setdefault(room.building_id, []).append(room)
+            beds = {b_id: sum(r.capacity for r in rooms) for b_id, rooms in by_building.items()}
+            total_beds = sum(beds.values())
+
+            # Proportional quotas, then hand the remainder to buildings with spare beds
+            quotas = {b_id: len(members) * b // total_beds for b_id, b in beds.items()}
+            remainder = len(members) - sum(quotas.values())
+            for b_id in by_building:
+                extra = min(remainder, beds[b_id] - quotas[b_id])
+                quotas[b_id] += extra
+                remainder -= extra
+
+            start = 0
+            for b_id, rooms in by_building.items():
+                block_people = members[start:start + quotas[b_id]]
+                start += quotas[b_id]
+                if block_people:
+                    blocks.append((block_people, rooms))
+        return blocks
+
+    def _optimize_decomposed(self, parameters, formulation: str, solver_config: SolverConfig,
+                             workers: Optional[int] = None) -> bool:
+        """Solve each block with its own CBC instance in a process pool and merge"""
+        with self.last_stats.phase('decompose'):
+            blocks = self._decompose(parameters)
+        if blocks is None:
+            return False
+        self.last_stats.count('blocks', len(blocks))
+
+        with self.last_stats.phase('solve', solver=True), \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for block_people, block_rooms in blocks:
+                block_buildings = [self.buildings[b_id]
+                                   for b_id in {r.building_id for r in block_rooms}]
+                futures.append(pool.submit(_solve_block, block_people, block_rooms,
+                                           block_buildings, parameters, formulation,
+                                           solver_config))
+            results = [future.result() for future in futures]
+
+        if any(result is None for result in results):
+            return False
+        self.assignments = {}
+        for result in results:
+            self.assignments.update(result)
+        return True
+
+    def _repair(self, unplaced: List[str], parameters) -> bool:
+        """Place unplaced people around the fixed assignments of everyone else
+
+        Only rooms with spare beds that match a newcomer's segment are
+        modelled, plus just enough empty rooms to hold all newcomers. If that
+        pool is too small the repair is retried over every room with spare
+        beds. Church grouping is a preference here: a room or floor that
+        already holds the person's church is cheaper, but not required.
+        """
+        occupants: Dict[str, List[str]] = {}
+        for p_id, r_id in self.assignments.items():
+            occupants.setdefault(r_id, []).append(p_id)
+
+        segment_of = {p_id: self._segment_key(self.people[p_id], parameters) for p_id in unplaced}
+        needed = set(segment_of.values())
+
+        def spare(r_id):
+            return self.rooms[r_id].capacity - len(occupants.get(r_id, []))
+
+        def room_segment(r_id):
+            return self._segment_key(self.people[occupants[r_id][0]], parameters)
+
+        partial = [r_id for r_id in sorted(occupants)
+                   if spare(r_id) > 0 and room_segment(r_id) in needed]
+        newcomers = [self.people[p_id] for p_id in unplaced]
+        empty = [r.id for r in sorted(self.rooms.values(), key=lambda r: (r.building_id, r.floor, r.id))
+                 if r.id not in occupants and any(r.accepts(p) for p in newcomers)]
+
+        # Enough empty rooms for every newcomer and at least one per segment
+        pool, beds = [], 0
+        for r_id in empty:
+            if beds >= len(unplaced) and len(pool) >= len(needed):
+                break
+            pool.append(r_id)
+            beds += self.rooms[r_id].capacity
+
+        for candidates in (partial + pool, partial + empty):
+            assignments = self._solve_repair(unplaced, segment_of, candidates, occupants, parameters)
+            if assignments is not None:
+                self.assignments.update(assignments)
+                return True
+        return False
+
+    def _solve_repair(self, unplaced: List[str], segment_of: Dict[str, Tuple],
+                      candidates: List[str], occupants: Dict[str, List[str]],
+                      parameters) -> Optional[Dict[str, str]]:
+        """Solve the local repair problem over the candidate rooms"""
+        room_segment = {r_id: self._segment_key(self.people[occupants[r_id][0]], parameters)
+                        for r_id in candidates if r_id in occupants}
+        # Only pairs where the room accepts the person and is empty or already
+        # holds the person's segment
+        pairs = [(p_id, r_id) for p_id in unplaced for r_id in candidates
+                 if room_segment.get(r_id, segment_of[p_id]) == segment_of[p_id]
+                 and self.rooms[r_id].accepts(self.people[p_id])]
+
+        churches_on_floor: Dict[Tuple, Set[str]] = {}
+        churches_in_room: Dict[str, Set[str]] = {}
+        for r_id, members in occupants.items():
+            room = self.rooms[r_id]
+            for p_id in members:
+                church_id = self.people[p_id].church_id
+                churches_on_floor.setdefault((room.building_id, room.floor), set()).add(church_id)
+                churches_in_room.setdefault(r_id, set()).add(church_id)
+
+        prob = LpProblem("Conference_Housing_Repair", LpMinimize)
+        y = LpVariable.dicts("place", pairs, cat='Binary')
+        empty = [r_id for r_id in candidates if r_id not in occupants]
+        segments = sorted(set(segment_of.values()), key=str)
+        # Segment claiming each empty room, so newcomers keep the separation rules
+        claim = LpVariable.dicts("claim", ((s, r_id) for s in range(len(segments)) for r_id in empty),
+                                 cat='Binary')
+
+        def church_cost(p_id, r_id):
+            church_id = self.people[p_id].church_id
+            room = self.rooms[r_id]
+            if church_id in churches_in_room.get(r_id, ()):
+                return 0
+            if church_id in churches_on_floor.get((room.building_id, room.floor), ()):
+                return 1
+            return 2
+
+        # Objective: open as few rooms as possible, then stay close to the church
+        prob += (len(unplaced) * 2 * lpSum(claim.values())
+                 + lpSum(church_cost(p_id, r_id) * y[p_id, r_id] for p_id, r_id in pairs))
+
+        by_person: Dict[str, List] = {}
+        by_room: Dict[str, List] = {}
+        for p_id, r_id in pairs:
+            by_person.setdefault(p_id, []).append(y[p_id, r_id])
+            by_room.setdefault(r_id, []).append((p_id, y[p_id, r_id]))
+
+        for p_id in unplaced:
+            if p_id not in by_person:
+                return None
+            prob += lpSum(by_person[p_id]) == 1
+
+        for r_id, placed in by_room.items():
+            room = self.rooms[r_id]
+            limit = room.capacity - len(occupants.get(r_id, [])) if parameters['room_capacity'] \
+                else len(unplaced)
+            if r_id in occupants:
+                prob += lpSum(var for _, var in placed) <= limit
+                continue
+            prob += lpSum(claim[s, r_id] for s in range(len(segments))) <= 1
+            for s, segment in enumerate(segments):
+                prob += (lpSum(var for p_id, var in placed if segment_of[p_id] == segment)
+                         <= limit * claim[s, r_id])
+
+        prob.solve(replace(self.solver_config, warm_start=False, msg=False).create_solver())
+        if not _solution_found(prob):
+            return None
+        return {p_id: r_id for (p_id, r_id), var in y.items() if value(var) > 0.5}
+
     def get_assignments(self) -> pd.DataFrame:
         """Return current assignments in a readable format"""
         assignments_list = []
@@ -154,38 +692,49 @@ class HousingOptimizer:
         
         return pd.DataFrame(assignments_list)
 
-    def load_from_excel(self, file_path: str):
-        """Load data from Excel file"""
-        processor = ExcelDataProcessor()
-        data = processor.process_data_for_optimizer(file_path)
-        
-        # Load buildings
-        for building_id, building_data in data['buildings'].items():
-            building = Building(
-                id=building_data['id'],
-                name=building_data['name'],
-                floors=building_data['floors'],
-                rooms_per_floor={}  # Will be populated from rooms data
-            )
-            self.add_building(building)
-        
-        # Load rooms
-        for room_id, room_data in data['rooms'].items():
-            room = Room(
-                id=room_data['id'],
-                building_id=room_data['building_id'],
-                floor=room_data['floor'],
-                capacity=room_data['capacity']
-            )
-            self.rooms[room_id] = room
-            
-        # Load people
-        for person_id, person_data in data['people'].items():
-            person = Person(
-                id=person_data['id'],
-                name=person_data['name'],
-                church_id=person_data['church_id'],
-                is_leader=person_data['is_leader'],
-                gender=person_data['gender']
-            )
-            self.add_person(person)
\ No newline at end of file
+    def load_from_excel(self, file_path, cache: Optional[WorkbookCache] = None):
+        """Load data from Excel file, through the parsed-workbook cache if one is given
+
+        Per-phase timings are logged and kept in self.load_stats.
+        """
+        self.load_stats = RunStats(capture=self.capture)
+        with self.load_stats.run():
+            processor = ExcelDataProcessor(cache=cache, stats=self.load_stats)
+            columns = processor.load_entity_columns(file_path)
+            with self.load_stats.phase('entities'):
+                self._add_entities(columns)
+        self.load_stats.log(self.logger, "load_from_excel")
+
+    def _add_entities(self, columns: Dict[str, Dict[str, list]]):
+        """Build the entities straight from the column lists"""
+        buildings = columns['buildings']
+        for values in zip(*buildings.values()):
+            # rooms_per_floor will be populated from rooms data
+            self.add_building(Building(**dict(zip(buildings, values)), rooms_per_floor={}))
+
+        rooms = columns['rooms']
+        for values in zip(*rooms.values()):
+            room = Room(**dict(zip(rooms, values)))
+            self.rooms[room.id] = room
+
+        people = columns['people']
+        for values in zip(*people.values()):
+            self.add_person(Person(**dict(zip(people, values))))
+
+
+def _solve_block(people: List[Person], rooms: List[Room], buildings: List[Building],
+                 parameters, formulation: str,
+                 solver_config: SolverConfig) -> Optional[Dict[str, str]]:
+    """Solve one decomposition block in a worker process"""
+    optimizer = HousingOptimizer()
+    for building in buildings:
+        optimizer.add_building(building)
+    for room in rooms:
+        optimizer.rooms[room.id] = room
+    for person in people:
+        optimizer.add_person(person)
+
+    if optimizer.optimize(parameters=parameters, formulation=formulation,
+                          solver_config=solver_config):
+        return optimizer.assignments
+    return None
@@ -0,0 +1,327 @@
+from itertools import chain, repeat
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pulp import (LpAffineExpression, LpBinary, LpConstraint, LpConstraintEQ, LpConstraintGE,
+                  LpConstraintLE, LpMinimize, LpProblem, LpVariable)
+from run_stats import RunStats
+
+
+# Objective weights, read from the optimizer parameters with these defaults
+SCORING_WEIGHTS = {
+    'room_weight': 1.0,  # per room in use
+    'floor_split_weight': 2.0,  # per floor each church is spread over
+    'building_split_weight': 4.0,  # per building each church is spread over
+}
+
+
+def scoring_weights(parameters) -> Dict[str, float]:
+    """The objective weights of a parameter dict, defaults filled in"""
+    return {name: float(parameters.get(name, default)) for name, default in SCORING_WEIGHTS.items()}
+
+
+def _terms(variables, coefficient=1, extra=()):
+    """(var, coef) pairs for a sum of variables with one shared coefficient plus
+    optional extra terms; PuLP builds expressions from these without lpSum's copies"""
+    return chain(zip(variables, repeat(coefficient)), extra)
+
+
+class ModelIndex:
+    """Integer index arrays over the people and rooms of one solve
+
+    Everything the constraint families need (segment masks, church and
+    floor groups, the capacity vector) is computed here once, so the model
+    builder never re-filters the entity dicts.
+    """
+
+    def __init__(self, people: Dict, rooms: Dict, buildings: Dict):
+        self.person_ids: List[str] = list(people.keys())
+        self.room_ids: List[str] = list(rooms.keys())
+        person_list = list(people.values())
+        room_list = list(rooms.values())
+
+        self.gender = np.array([p.gender for p in person_list], dtype=object)
+        self.is_leader = np.fromiter((bool(p.is_leader) for p in person_list), dtype=bool,
+                                     count=len(person_list))
+        church_ids = np.array([str(p.church_id) for p in person_list])
+        self.church_names, self.church = np.unique(church_ids, return_inverse=True)
+
+        self.capacity = np.fromiter((r.capacity for r in room_list), dtype=np.int64,
+                                    count=len(room_list))
+        self.floor = np.fromiter((r.floor for r in room_list), dtype=np.int64,
+                                 count=len(room_list))
+        self.building = np.array([str(r.building_id) for r in room_list])
+        # Rooms with the same class number are interchangeable in every constraint
+        class_keys = [(r.building_id, r.floor, r.capacity, r.gender, r.role, tuple(sorted(r.tags)))
+                      for r in room_list]
+        class_of: Dict[Tuple, int] = {}
+        self.room_class = np.fromiter((class_of.setdefault(key, len(class_of)) for key in class_keys),
+                                      dtype=np.int64, count=len(room_list))
+
+        self.eligible = self._eligibility(person_list, room_list)
+
+        # Rooms per (building, floor), limited to floors the Buildings sheet declares
+        self.floor_rooms: Dict[Tuple[str, int], np.ndarray] = {}
+        if room_list:
+            keys, inverse = np.unique(
+                np.char.add(np.char.add(self.building, '\x00'), self.floor.astype(str)),
+                return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+            for k in range(len(keys)):
+                members = order[bounds[k]:bounds[k + 1]]
+                b_id, floor = str(self.building[members[0]]), int(self.floor[members[0]])
+                building = buildings.get(b_id)
+                if building is not None and 1 <= floor <= building.floors:
+                    self.floor_rooms[(b_id, floor)] = members
+
+    def _eligibility(self, person_list, room_list) -> np.ndarray:
+        """(people x rooms) mask of the pairs Room.accepts allows, computed per column"""
+        eligible = np.ones((len(person_list), len(room_list)), dtype=bool)
+        eligible &= self.capacity > 0
+
+        room_gender = np.array([r.gender or '' for r in room_list], dtype=object)
+        if (room_gender != '').any():
+            eligible &= (room_gender == '') | (room_gender[None, :] == self.gender[:, None])
+
+        room_role = np.array([r.role or '' for r in room_list], dtype=object)
+        eligible[:, room_role == 'leader'] &= self.is_leader[:, None]
+        eligible[:, room_role == 'student'] &= ~self.is_leader[:, None]
+
+        # One tag test per distinct requirement set rather than per person
+        requirement_rows: Dict[frozenset, List[int]] = {}
+        for i, person in enumerate(person_list):
+            if person.requirements:
+                requirement_rows.setdefault(frozenset(person.requirements), []).append(i)
+        for requirements, rows in requirement_rows.items():
+            has_tags = np.fromiter((requirements <= r.tags for r in room_list), dtype=bool,
+                                   count=len(room_list))
+            eligible[rows] &= has_tags
+        return eligible
+
+    @property
+    def num_people(self) -> int:
+        return len(self.person_ids)
+
+    @property
+    def num_rooms(self) -> int:
+        return len(self.room_ids)
+
+    def church_members(self) -> List[np.ndarray]:
+        """Person indices of each church, in church_names order"""
+        order = np.argsort(self.church, kind='stable')
+        bounds = np.searchsorted(self.church[order], np.arange(len(self.church_names) + 1))
+        return [order[bounds[c]:bounds[c + 1]] for c in range(len(self.church_names))]
+
+
+class MilpModel:
+    """The person x room assignment MILP, emitted from a ModelIndex
+
+    x is a (people x rooms) object array of binaries so that a room's
+    column or a person's row is a plain slice; pairs the room does not
+    accept are pruned and stay None. Constraint families are kept by name,
+    together with their row counts; each family's build time goes into
+    stats as a "constraints:<family>" phase.
+
+    The objective scores a layout: room_weight per room in use and, with
+    church grouping, floor_split_weight per floor and building_split_weight
+    per building each church occupies. Room use and church presence are
+    binary indicators tied to the assignment by aggregated big-M rows.
+    """
+
+    def __init__(self, index: ModelIndex, parameters, formulation: str = 'aggregated',
+                 stats: Optional[RunStats] = None):
+        self.index = index
+        self.parameters = parameters
+        self.stats = stats if stats is not None else RunStats()
+        self.prob = LpProblem("Conference_Housing_Assignment", LpMinimize)
+        self.families: Dict[str, List[LpConstraint]] = {}
+        # (indicator per room, mask of the people allowed when it is 1)
+        self.room_types: List[Tuple[np.ndarray, np.ndarray]] = []
+
+        P, R = index.num_people, index.num_rooms
+        eligible = index.eligible
+        phase = self.stats.phase
+        with phase('variables'):
+            # Decision variables: 1 if person i is assigned to room j, 0 otherwise.
+            # Only pairs the room accepts get a variable; the rest of x stays None.
+            self.rows, self.cols = np.nonzero(eligible)
+            self.variables = np.fromiter((LpVariable(f"assign_{i}_{j}", cat=LpBinary)
+                                          for i, j in zip(self.rows, self.cols)),
+                                         dtype=object, count=len(self.rows))
+            self.x = np.full((P, R), None, dtype=object)
+            self.x[self.rows, self.cols] = self.variables
+
+        weights = scoring_weights(parameters)
+        objective: List[Tuple[LpVariable, float]] = []
+
+        # 1. Each person must be assigned to exactly one room
+        with phase('constraints:assignment'):
+            for i in range(P):
+                self._add('assignment', _terms(self.x[i, eligible[i]]), LpConstraintEQ, 1)
+
+        # 2. Room capacity constraints (if enabled), which also switch on the
+        # room's in-use indicator when room usage is scored
+        self.room_used = np.full(R, None, dtype=object)
+        if weights['room_weight']:
+            with phase('constraints:capacity'):
+                for j in range(R):
+                    column = self.column(j)
+                    if len(column) == 0:
+                        continue
+                    self.room_used[j] = LpVariable(f"room_used_{j}", cat=LpBinary)
+                    limit = min(self._limit(j), len(column))
+                    self._add('capacity', _terms(column, extra=[(self.room_used[j], -limit)]),
+                              LpConstraintLE, 0)
+                    objective.append((self.room_used[j], weights['room_weight']))
+            # Identical rooms are opened in index order, which removes the
+            # symmetric layouts that only swap rooms of one class
+            with phase('constraints:symmetry'):
+                for k in np.unique(index.room_class):
+                    members = [j for j in np.flatnonzero(index.room_class == k)
+                               if self.room_used[j] is not None]
+                    for j, later in zip(members, members[1:]):
+                        self._add('symmetry', [(self.room_used[j], 1), (self.room_used[later], -1)],
+                                  LpConstraintGE, 0)
+        elif parameters['room_capacity']:
+            with phase('constraints:capacity'):
+                for j in range(R):
+                    self._add('capacity', _terms(self.column(j)), LpConstraintLE,
+                              int(index.capacity[j]))
+
+        # 3. Gender separation and 4. Leader/Student separation (if enabled)
+        males, females = index.gender == 'M', index.gender == 'F'
+        if parameters['gender_separation']:
+            with phase('constraints:gender'):
+                self._add_separation('gender', 'male_room', males, females, formulation)
+        if parameters['leader_separation']:
+            with phase('constraints:leader'):
+                self._add_separation('leader', 'leader_room', index.is_leader,
+                                     ~index.is_leader, formulation)
+
+        # 5. Church grouping preference (if enabled): an indicator per church and
+        # floor (and per church and building) it occupies, each one penalised
+        self.church_presence: List[Tuple[LpVariable, np.ndarray, np.ndarray]] = []
+        if parameters['church_grouping']:
+            building_rooms: Dict[str, List[np.ndarray]] = {}
+            for (b_id, _), floor_rooms in index.floor_rooms.items():
+                building_rooms.setdefault(b_id, []).append(floor_rooms)
+            areas = [('floor', key, rooms, weights['floor_split_weight'])
+                     for key, rooms in index.floor_rooms.items()]
+            areas += [('building', b_id, np.concatenate(parts), weights['building_split_weight'])
+                      for b_id, parts in building_rooms.items()]
+            with phase('constraints:church'):
+                for c, members in enumerate(index.church_members()):
+                    for area, key, rooms, weight in areas:
+                        if not weight:
+                            continue
+                        block = np.ix_(members, rooms)
+                        block_vars = self.x[block][eligible[block]]
+                        if len(block_vars) == 0:
+                            continue
+                        present = LpVariable(f"church_{c}_{area}_{len(self.church_presence)}",
+                                             cat=LpBinary)
+                        # One row per member: a person in the area needs the indicator on
+                        for i in members:
+                            person_vars = self.x[i, rooms][eligible[i, rooms]]
+                            if len(person_vars):
+                                self._add('church', _terms(person_vars, extra=[(present, -1)]),
+                                          LpConstraintLE, 0)
+                        self.church_presence.append((present, members, rooms))
+                        objective.append((present, weight))
+
+        with phase('objective'):
+            self.prob.setObjective(LpAffineExpression(objective))
+        self.stats.count('variables', self.prob.numVariables())
+        for family, rows in self.family_counts().items():
+            self.stats.count(f'constraints:{family}', rows)
+
+    def column(self, j: int, people: np.ndarray = None) -> np.ndarray:
+        """Variables of room j, optionally only for the given person indices"""
+        if people is None:
+            return self.x[self.index.eligible[:, j], j]
+        return self.x[people[self.index.eligible[people, j]], j]
+
+    def _add(self, family: str, terms, sense: int, rhs) -> None:
+        constraint = LpConstraint(terms, sense, rhs=rhs)
+        self.prob.addConstraint(constraint)
+        self.families.setdefault(family, []).append(constraint)
+
+    def _limit(self, j: int) -> int:
+        """Upper bound on a room's occupancy; without capacity limits it is the head count"""
+        if self.parameters['room_capacity']:
+            return int(self.index.capacity[j])
+        return self.index.num_people
+
+    def _add_separation(self, family: str, indicator: str, group_a: np.ndarray,
+                        group_b: np.ndarray, formulation: str) -> None:
+        """Keep group_a and group_b out of each other's rooms"""
+        a, b = np.flatnonzero(group_a), np.flatnonzero(group_b)
+        if formulation == 'pairwise':
+            # One x[a, r] + x[b, r] <= 1 row for every conflicting pair in every room
+            for j in range(self.index.num_rooms):
+                for var_a in self.column(j, a):
+                    for var_b in self.column(j, b):
+                        self._add(family, _terms((var_a, var_b)), LpConstraintLE, 1)
+            return
+
+        # Aggregated: a room-type indicator, 1 for a group_a room and 0 for a group_b
+        # room. Rooms that only one group can use need neither indicator nor rows.
+        room_type = np.full(self.index.num_rooms, None, dtype=object)
+        self.room_types.append((room_type, group_a))
+        for j in range(self.index.num_rooms):
+            vars_a, vars_b = self.column(j, a), self.column(j, b)
+            if len(vars_a) == 0 or len(vars_b) == 0:
+                continue
+            room_type[j] = LpVariable(f"{indicator}_{j}", cat=LpBinary)
+            limit = self._limit(j)
+            self._add(family, _terms(vars_a, extra=[(room_type[j], -limit)]),
+                      LpConstraintLE, 0)
+            self._add(family, _terms(vars_b, extra=[(room_type[j], limit)]),
+                      LpConstraintLE, limit)
+
+    def family_counts(self) -> Dict[str, int]:
+        """Number of constraint rows per family"""
+        return {family: len(rows) for family, rows in self.families.items()}
+
+    def set_initial_values(self, start: Dict[str, str]) -> None:
+        """Load an assignment into the variables' initial values for a MIP start"""
+        index = self.index
+        room_index = {r_id: j for j, r_id in enumerate(index.room_ids)}
+        room_of = np.fromiter((room_index.get(start.get(p_id), -1) for p_id in index.person_ids),
+                              dtype=np.int64, count=index.num_people)
+        if 'symmetry' in self.families:
+            # Move each class's occupied rooms to its first rooms, the order the
+            # symmetry rows require; the rooms are interchangeable
+            relabel = np.arange(index.num_rooms)
+            in_use = np.isin(np.arange(index.num_rooms), room_of)
+            for k in np.unique(index.room_class):
+                members = np.flatnonzero(index.room_class == k)
+                used = members[in_use[members]]
+                relabel[used] = members[:len(used)]
+            room_of = np.where(room_of >= 0, relabel[room_of], -1)
+        chosen = room_of[self.rows] == self.cols
+        for var, on in zip(self.variables, chosen):
+            var.setInitialValue(int(on))
+
+        occupied = np.zeros(index.eligible.shape, dtype=bool)
+        placed = np.flatnonzero(room_of >= 0)
+        occupied[placed, room_of[placed]] = True
+        for room_type, group_a in self.room_types:
+            holds_a = occupied[group_a].any(axis=0)
+            for var, on in zip(room_type, holds_a):
+                if var is not None:
+                    var.setInitialValue(int(on))
+        for var, on in zip(self.room_used, occupied.any(axis=0)):
+            if var is not None:
+                var.setInitialValue(int(on))
+        for var, members, rooms in self.church_presence:
+            var.setInitialValue(int(occupied[np.ix_(members, rooms)].any()))
+
+    def extract_assignments(self) -> Dict[str, str]:
+        """Read the solution back as person_id -> room_id"""
+        values = np.fromiter((var.varValue or 0 for var in self.variables), dtype=float,
+                             count=len(self.variables))
+        # Using 0.5 as threshold for binary variables
+        chosen = np.flatnonzero(values > 0.5)
+        person_ids, room_ids = self.index.person_ids, self.index.room_ids
+        return {person_ids[i]: room_ids[j] for i, j in zip(self.rows[chosen], self.cols[chosen])}
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+CAPTURE_MODES = (None, 'tracemalloc', 'cprofile')
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    """High-water mark of resident memory for this process or its finished children"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+@dataclass
+class PhaseStats:
+    name: str
+    seconds: float
+    peak_rss_mb: Optional[float] = None  # process high-water mark when the phase ended
+    traced_peak_mb: Optional[float] = None  # Python allocations peak within the phase (tracemalloc)
+
+
+@dataclass
+class RunStats:
+    """Wall time and memory per phase of one load or solve, plus model sizes
+
+    capture=None only reads timers and the process memory high-water mark.
+    'tracemalloc' also records the peak of Python allocations inside each
+    phase, and 'cprofile' keeps a cumulative-time profile of the whole run
+    in `profile`; both slow the run down noticeably.
+    """
+    capture: Optional[str] = None
+    phases: List[PhaseStats] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)  # e.g. variables, constraints:capacity
+    objective: Optional[float] = None  # solver objective value, when a model was solved
+    profile: Optional[str] = None
+
+    def __post_init__(self):
+        if self.capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode: {self.capture}")
+
+    @contextmanager
+    def phase(self, name: str, solver: bool = False):
+        """Time a block; solver phases report the memory of finished child processes"""
+        tracing = self.capture == 'tracemalloc' and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = PhaseStats(name, time.perf_counter() - start, _peak_rss_mb(children=solver))
+            if tracing:
+                stats.traced_peak_mb = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            self.phases.append(stats)
+
+    @contextmanager
+    def run(self):
+        """Wrap a whole load or solve, switching on the capture mode if any"""
+        profiler = None
+        started_tracing = False
+        if self.capture == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif self.capture == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+                self.profile = report.getvalue()
+            if started_tracing:
+                tracemalloc.stop()
+
+    def count(self, name: str, value: int):
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(phase.seconds for phase in self.phases)
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per phase"""
+        return pd.DataFrame([vars(phase) for phase in self.phases],
+                            columns=['name', 'seconds', 'peak_rss_mb', 'traced_peak_mb'])
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{phase.name} {phase.seconds:.3f}s" for phase in self.phases)
+        items = [f"{name} {value}" for name, value in self.counts.items()]
+        if self.objective is not None:
+            items.append(f"objective {self.objective:g}")
+        counts = ", ".join(items)
+        return f"{self.total_seconds:.3f}s total ({phases})" + (f"; {counts}" if counts else "")
+
+    def log(self, logger: logging.Logger, label: str):
+        logger.info(f"{label}: {self.summary()}")
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+
+
+def fingerprint(*parts) -> str:
+    """Stable sha256 of JSON-serialisable parts (sets are sorted first)"""
+    def normalise(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        raise TypeError(f"Cannot fingerprint {type(value).__name__}")
+
+    payload = json.dumps(parts, sort_keys=True, default=normalise, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SolutionCache:
+    """Solved assignments keyed by (dataset fingerprint, solve settings)
+
+    Keeps the most recent max_entries solutions in an in-memory LRU and,
+    when a directory is given, one JSON file per solution on disk (the
+    max_disk_entries most recently used) so a restarted server still
+    answers repeated requests. Solutions are also indexed by dataset alone,
+    so a request that only changes parameters can start from the last
+    layout found for the same people and rooms.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 64,
+                 max_disk_entries: int = 1024):
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        # key -> (dataset fingerprint, assignments)
+        self._memory: "OrderedDict[str, Tuple[str, Dict[str, str]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Cached assignments for key, or None"""
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is not None:
+                self._remember(key, *entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._memory.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def nearest(self, dataset_key: str) -> Optional[Dict[str, str]]:
+        """Most recently used solution for the same dataset under any settings"""
+        for cached_dataset, assignments in reversed(self._memory.values()):
+            if cached_dataset == dataset_key:
+                return dict(assignments)
+        return None
+
+    def put(self, key: str, dataset_key: str, assignments: Dict[str, str]):
+        """Store a solution in memory and, if configured, on disk"""
+        self._remember(key, dataset_key, dict(assignments))
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            staging = self.directory / f".{key}.{os.getpid()}.tmp"
+            staging.write_text(json.dumps({'dataset': dataset_key, 'assignments': assignments}))
+            staging.replace(self.directory / f"{key}.json")
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete the least recently used files beyond max_disk_entries"""
+        files = sorted(self.directory.glob("*.json"), key=lambda f: f.stat().st_mtime)
+        for path in files[:max(0, len(files) - self.max_disk_entries)]:
+            path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, dataset_key: str, assignments: Dict[str, str]):
+        self._memory[key] = (dataset_key, assignments)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        if self.directory is None:
+            return None
+        path = self.directory / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text())
+            os.utime(path)  # mark as recently used
+            return data['dataset'], data['assignments']
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable cached solution {path.name}: {str(e)}")
+            return None
@@ -0,0 +1,265 @@
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import tempfile
+import threading
+import time
+from housing_optimizer import HousingOptimizer, SolverConfig
+from run_stats import RunStats
+
+# Solver log lines that carry an incumbent objective and/or a bound
+_INCUMBENT = re.compile(r"(?:Integer solution of|Objective value:)\s+(\S+)")
+_NODE_LINE = re.compile(r"(\S+) best solution, best possible (\S+)")
+_SUMMARY = re.compile(r"best objective (\S+) \(best possible (\S+)\)")
+_BOUND = re.compile(r"(?:Continuous objective value is|changed objective from \S+ to)\s+(\S+)")
+_NO_VALUE = 1e50  # CBC prints 1e+50 while it has no incumbent
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        value = float(text.rstrip(','))
+    except ValueError:
+        return None
+    return value if abs(value) < _NO_VALUE else None
+
+
+@dataclass
+class SolveProgress:
+    """Snapshot of a job as shown in the app"""
+    state: str
+    elapsed: float
+    incumbent: Optional[float] = None
+    best_bound: Optional[float] = None
+
+    @property
+    def gap(self) -> Optional[float]:
+        """Relative MIP gap between incumbent and bound"""
+        if self.incumbent is None or self.best_bound is None:
+            return None
+        return abs(self.incumbent - self.best_bound) / max(abs(self.incumbent), 1e-9)
+
+
+def _run(optimizer: HousingOptimizer, options: Dict, connection):
+    """Worker process body: solve and send (success, assignments, stats, error) back"""
+    if hasattr(os, 'setpgrp'):
+        # Own process group, so cancelling also kills the solver binary we spawn
+        os.setpgrp()
+    try:
+        success = optimizer.optimize(**options)
+        connection.send((success, optimizer.assignments, optimizer.last_stats, None))
+    except Exception as e:
+        connection.send((False, {}, optimizer.last_stats, str(e)))
+    finally:
+        connection.close()
+
+
+class SolveJob:
+    """Handle on one optimize() call running in a worker process
+
+    state moves from 'queued' to 'running' and ends as 'done', 'failed' or
+    'cancelled'. The solver writes its log to log_path, which progress()
+    parses for the incumbent and best bound; CBC writes that file in
+    blocks, so those figures can trail the solver by a few lines.
+    """
+
+    def __init__(self, job_id: int, optimizer: HousingOptimizer, options: Dict, log_path: str):
+        self.id = job_id
+        self.optimizer = optimizer
+        self.options = options
+        self.log_path = log_path
+        self.state = 'queued'
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.success = False
+        self.assignments: Dict[str, str] = {}
+        self.error: Optional[str] = None
+        self.stats: Optional[RunStats] = None  # the worker's optimize() phases
+        self._process = None
+        self._connection = None
+        self._log_offset = 0
+        self._incumbent: Optional[float] = None
+        self._bound: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ('queued', 'running')
+
+    def _start(self, context):
+        receiver, sender = context.Pipe(duplex=False)
+        self._process = context.Process(target=_run, args=(self.optimizer, self.options, sender),
+                                        daemon=True)
+        self._process.start()
+        sender.close()
+        self._connection = receiver
+        self.state = 'running'
+        self.started = time.time()
+
+    def _poll(self):
+        """Collect the worker's result once it has sent one"""
+        if self.state != 'running':
+            return
+        try:
+            if self._connection.poll():
+                self.success, self.assignments, self.stats, self.error = self._connection.recv()
+                self.state = 'done' if self.error is None else 'failed'
+            elif self._process.is_alive():
+                return
+            else:
+                self.state, self.error = 'failed', f"worker exited with code {self._process.exitcode}"
+        except (EOFError, OSError) as e:
+            self.state, self.error = 'failed', f"worker exited: {str(e)}"
+        self._finish()
+
+    def _finish(self):
+        self.finished = time.time()
+        self._read_log()
+        if self._connection is not None:
+            self._connection.close()
+        if self._process is not None:
+            self._process.join(timeout=1)
+
+    def apply(self) -> bool:
+        """Copy a finished job's layout, settings and stats onto its optimizer"""
+        if self.state != 'done' or not self.success:
+            return False
+        self.optimizer.assignments = self.assignments
+        self.optimizer.last_stats = self.stats
+        self.optimizer.parameters = self.options.get('parameters') or self.optimizer.parameters
+        return True
+
+    def cancel(self):
+        """Stop the job; a running worker and its solver process are killed"""
+        if self.state == 'running':
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                # No process groups here, or the worker has not created its own yet
+                self._process.kill()
+            self.state = 'cancelled'
+            self._finish()
+        elif self.state == 'queued':
+            self.state = 'cancelled'
+            self.finished = time.time()
+
+    def _read_log(self):
+        """Parse the log lines written since the last call"""
+        try:
+            with open(self.log_path, 'rb') as log:
+                log.seek(self._log_offset)
+                chunk = log.read()
+        except OSError:
+            return
+        end = chunk.rfind(b'\n') + 1  # leave a partial last line for the next read
+        self._log_offset += end
+        for line in chunk[:end].decode(errors='replace').splitlines():
+            match = _NODE_LINE.search(line) or _SUMMARY.search(line)
+            if match:
+                self._update(match.group(1), match.group(2))
+            match = _INCUMBENT.search(line)
+            if match:
+                self._update(incumbent=match.group(1))
+            match = _BOUND.search(line)
+            if match:
+                self._update(bound=match.group(1))
+
+    def _update(self, incumbent: Optional[str] = None, bound: Optional[str] = None):
+        if incumbent is not None and _number(incumbent) is not None:
+            self._incumbent = _number(incumbent)
+        if bound is not None and _number(bound) is not None:
+            self._bound = _number(bound)
+
+    def progress(self) -> SolveProgress:
+        """State, elapsed seconds, and the latest incumbent and bound from the solver log"""
+        if self.state == 'running':
+            self._read_log()
+        if self.started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished or time.time()) - self.started
+        return SolveProgress(self.state, elapsed, self._incumbent, self._bound)
+
+
+class SolveQueue:
+    """Runs optimize() calls in worker processes, at most max_running at a time
+
+    One queue is meant to be shared by every session of a server: submit()
+    returns at once, jobs wait their turn in submission order, and any
+    call to poll() (or get()) starts queued jobs as slots free up.
+    """
+
+    def __init__(self, max_running: int = 1, log_directory: Optional[str] = None,
+                 keep_finished: int = 50):
+        self.max_running = max_running
+        self.log_directory = log_directory or tempfile.gettempdir()
+        self.keep_finished = keep_finished
+        self.logger = logging.getLogger(__name__)
+        self._jobs: Dict[int, SolveJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context()
+
+    def submit(self, optimizer: HousingOptimizer, **options) -> SolveJob:
+        """Queue optimizer.optimize(**options) and return its job handle
+
+        The solver log is redirected to a per-job file so progress can be
+        read from it.
+        """
+        with self._lock:
+            job_id = next(self._ids)
+            log_path = os.path.join(self.log_directory, f"housing_solve_{os.getpid()}_{job_id}.log")
+            solver_config = options.get('solver_config') or SolverConfig()
+            options = dict(options, solver_config=replace(solver_config, log_path=log_path,
+                                                          msg=False))
+            job = SolveJob(job_id, optimizer, options, log_path)
+            self._jobs[job_id] = job
+            self._dispatch()
+        self.logger.info(f"Queued solve job {job_id}")
+        return job
+
+    def get(self, job_id: int) -> Optional[SolveJob]:
+        self.poll()
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[SolveJob]:
+        """All jobs still known to the queue, oldest first"""
+        self.poll()
+        return list(self._jobs.values())
+
+    def poll(self):
+        """Collect finished jobs and start queued ones"""
+        with self._lock:
+            self._dispatch()
+
+    def _dispatch(self):
+        for job in self._jobs.values():
+            job._poll()
+        running = sum(job.state == 'running' for job in self._jobs.values())
+        for job in self._jobs.values():
+            if running >= self.max_running:
+                break
+            if job.state == 'queued':
+                job._start(self._context)
+                running += 1
+                self.logger.info(f"Started solve job {job.id}")
+
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+            try:
+                os.remove(job.log_path)
+            except OSError:
+                pass
+
+    def cancel(self, job_id: int):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.cancel()
+                self.logger.info(f"Cancelled solve job {job_id}")
+            self._dispatch()
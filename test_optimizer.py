@@ -1,6 +1,11 @@
 import pandas as pd
-from housing_optimizer import HousingOptimizer
-from excel_processor import ExcelDataProcessor, create_example_excel
+from housing_optimizer import HousingOptimizer, Person, SolverConfig
+from excel_processor import ExcelDataProcessor, WorkbookCache, create_example_excel
+from model_builder import ModelIndex
+from solution_cache import SolutionCache
+from solve_jobs import SolveQueue
+from benchmark import synthetic_optimizer, benchmark_solve, load_history, compare_history
+import time
 from datetime import datetime
 
 def test_housing_optimizer():
@@ -60,6 +65,231 @@ def test_housing_optimizer():
     else:
         print("\nOptimization failed - could not find valid assignment")
 
+def check_assignment_rules(optimizer: HousingOptimizer):
+    """Assert that every person is placed and no room breaks a separation or capacity rule"""
+    assert set(optimizer.assignments) == set(optimizer.people)
+    occupants = {}
+    for person_id, room_id in optimizer.assignments.items():
+        occupants.setdefault(room_id, []).append(optimizer.people[person_id])
+    for room_id, people in occupants.items():
+        assert len(people) <= optimizer.rooms[room_id].capacity
+        assert len({p.gender for p in people}) == 1
+        assert len({p.is_leader for p in people}) == 1
+
+def test_aggregated_matches_pairwise_formulation(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+
+    results = {}
+    for formulation in ('pairwise', 'aggregated'):
+        optimizer = HousingOptimizer()
+        optimizer.load_from_excel(test_file)
+        assert optimizer.optimize(formulation=formulation)
+        check_assignment_rules(optimizer)
+        results[formulation] = optimizer.get_assignments()
+
+    # Both formulations place the same participants under the same rules
+    pairwise, aggregated = results['pairwise'], results['aggregated']
+    assert sorted(pairwise['person_id']) == sorted(aggregated['person_id'])
+    assert len(pairwise) == len(aggregated) == 40
+
+def test_room_class_engine(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+
+    assert optimizer.optimize(engine='room_class')
+    check_assignment_rules(optimizer)
+    # Church grouping keeps each church on a single floor, and the rooms are packed:
+    # 3 leader rooms (3 men, 2 women) plus 9 rooms each for 17 male and 18 female students
+    assignments = optimizer.get_assignments()
+    assert (assignments.groupby('church_id')['floor'].nunique() == 1).all()
+    assert assignments['room_id'].nunique() == 21
+    assert optimizer.last_stats.objective == 21 + 5 * 2 + 5 * 4
+
+def test_greedy_engine_and_warm_start(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+
+    assert optimizer.optimize(engine='greedy')
+    check_assignment_rules(optimizer)
+
+    parameters = {'gender_separation': True, 'leader_separation': True,
+                  'church_grouping': False, 'room_capacity': True}
+    assert optimizer.optimize(parameters=parameters,
+                              solver_config=SolverConfig(warm_start=True, time_limit=60))
+    check_assignment_rules(optimizer)
+
+def test_apply_changes_keeps_existing_rooms(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+    assert optimizer.optimize(engine='room_class')
+    before = dict(optimizer.assignments)
+
+    adds = [Person(id='P100', name='Late 1', church_id='C1', is_leader=False, gender='F'),
+            Person(id='P101', name='Late 2', church_id='C2', is_leader=True, gender='M'),
+            Person(id='P102', name='Late 3', church_id='C9', is_leader=False, gender='M')]
+    assert optimizer.apply_changes(adds=adds, removes=['P001', 'P025'])
+
+    check_assignment_rules(optimizer)
+    assert 'P001' not in optimizer.assignments and 'P025' not in optimizer.assignments
+    for person_id, room_id in optimizer.assignments.items():
+        if person_id in before:
+            assert before[person_id] == room_id
+
+def test_decomposed_engine(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+
+    assert optimizer.optimize(engine='decomposed', workers=2)
+    check_assignment_rules(optimizer)
+
+def test_room_eligibility_prunes_variables(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    rooms = pd.read_excel(test_file, sheet_name='Rooms')
+    rooms['gender'] = ['F' if floor == 1 else '' for floor in rooms['floor']]
+    rooms['role'] = ''
+    rooms['tags'] = ''
+    rooms.loc[rooms['room_id'] == 'B2-2-01', 'tags'] = 'accessible'
+    rooms.loc[rooms['room_id'] == 'B2-3-01', 'capacity'] = 0
+    participants = pd.read_excel(test_file, sheet_name='Participants')
+    participants['requirements'] = ['Accessible' if pid == 'P003' else '' for pid in participants['participant_id']]
+    buildings = pd.read_excel(test_file, sheet_name='Buildings')
+    with pd.ExcelWriter(test_file, engine='openpyxl') as writer:
+        participants.to_excel(writer, sheet_name='Participants', index=False)
+        buildings.to_excel(writer, sheet_name='Buildings', index=False)
+        rooms.to_excel(writer, sheet_name='Rooms', index=False)
+
+    parameters = {'gender_separation': True, 'leader_separation': True,
+                  'church_grouping': False, 'room_capacity': True}
+    for engine in ('milp', 'room_class', 'greedy'):
+        optimizer = HousingOptimizer()
+        optimizer.load_from_excel(test_file)
+        assert optimizer.optimize(parameters=parameters, engine=engine)
+        check_assignment_rules(optimizer)
+        assert optimizer.assignments['P003'] == 'B2-2-01'
+        for person_id, room_id in optimizer.assignments.items():
+            assert optimizer.rooms[room_id].accepts(optimizer.people[person_id])
+
+    # Pruned: 20 men x 20 women-only rooms, 40 people x the zero-capacity room and
+    # the 38 other rooms still open to P003
+    index = ModelIndex(optimizer.people, optimizer.rooms, optimizer.buildings)
+    assert index.eligible.sum() == 40 * 60 - 20 * 20 - 40 - 38
+
+def test_workbook_cache_serves_repeat_loads(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    cache = WorkbookCache(tmp_path / "cache")
+
+    first, second = HousingOptimizer(), HousingOptimizer()
+    first.load_from_excel(test_file, cache=cache)
+    second.load_from_excel(test_file, cache=cache)
+
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert first.people == second.people
+    assert first.rooms == second.rooms
+    assert first.buildings == second.buildings
+
+    # A tiny size budget evicts the entry again
+    WorkbookCache(tmp_path / "cache", max_bytes=0).evict()
+    assert not any((tmp_path / "cache").iterdir())
+
+def test_solution_cache_answers_repeat_requests(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    cache = SolutionCache(tmp_path / "solutions")
+    parameters = {'gender_separation': True, 'leader_separation': True,
+                  'church_grouping': False, 'room_capacity': True}
+
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+    assert optimizer.optimize(parameters=parameters, cache=cache)
+    solved = dict(optimizer.assignments)
+
+    # A fresh cache on the same directory (a restarted server) returns the stored layout
+    restarted = SolutionCache(tmp_path / "solutions")
+    again = HousingOptimizer()
+    again.load_from_excel(test_file)
+    assert again.optimize(parameters=dict(parameters), cache=restarted)
+    assert restarted.hits == 1 and again.assignments == solved
+
+    # Other parameters miss, and the MILP starts from the cached layout
+    assert again.optimize(parameters=dict(parameters, church_grouping=True), cache=restarted)
+    assert restarted.misses == 1
+    check_assignment_rules(again)
+
+def test_run_stats_cover_load_and_solve_phases(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.capture = 'tracemalloc'
+    optimizer.load_from_excel(test_file)
+
+    load_phases = [phase.name for phase in optimizer.load_stats.phases]
+    assert load_phases == ['read', 'validate', 'columns', 'entities']
+    assert optimizer.load_stats.counts['participants'] == 40
+
+    assert optimizer.optimize()
+    stats = optimizer.last_stats
+    names = [phase.name for phase in stats.phases]
+    assert names[:2] == ['index', 'variables'] and names[-2:] == ['solve', 'extract']
+    assert 'constraints:church' in names
+    assert stats.counts['constraints:assignment'] == 40
+    assert all(phase.traced_peak_mb is not None for phase in stats.phases)
+
+    optimizer.capture = 'cprofile'
+    assert optimizer.optimize(engine='greedy')
+    assert 'cumulative' in optimizer.last_stats.profile
+
+def test_synthetic_events_and_benchmark_history(tmp_path):
+    optimizer = synthetic_optimizer(200, num_churches=4, capacity_mix={2: 0.5, 6: 0.5},
+                                    leader_ratio=0.25, seed=3)
+    assert len({p.church_id for p in optimizer.people.values()}) == 4
+    assert {r.capacity for r in optimizer.rooms.values()} == {2, 6}
+    assert sum(r.capacity for r in optimizer.rooms.values()) >= 250
+    assert synthetic_optimizer(200, seed=3).people == synthetic_optimizer(200, seed=3).people
+
+    history = tmp_path / "history.csv"
+    for _ in range(2):
+        results = benchmark_solve([100], ['greedy', 'milp'], time_limit=30,
+                                  history_path=str(history))
+        assert results['success'].all() and (results['people'] == 100).all()
+    assert len(load_history(history)) == 4
+    assert len(compare_history(load_history(history))) == 2
+
+def test_solve_queue_runs_jobs_in_background(tmp_path):
+    test_file = tmp_path / "test_conference_data.xlsx"
+    create_test_data(test_file)
+    optimizer = HousingOptimizer()
+    optimizer.load_from_excel(test_file)
+    queue = SolveQueue(max_running=1, log_directory=str(tmp_path))
+
+    # A long solve holds the only slot, so the second job waits behind it
+    slow = queue.submit(synthetic_optimizer(400, buildings=1, floors=2),
+                        solver_config=SolverConfig(time_limit=120))
+    quick = queue.submit(optimizer, engine='room_class')
+    assert (slow.state, quick.state) == ('running', 'queued')
+
+    queue.cancel(slow.id)
+    assert slow.progress().state == 'cancelled'
+    deadline = time.time() + 60
+    while queue.get(quick.id).active and time.time() < deadline:
+        time.sleep(0.1)
+
+    assert quick.state == 'done' and quick.success
+    assert quick.progress().best_bound is not None
+    optimizer.assignments = {}
+    assert quick.apply()
+    check_assignment_rules(optimizer)
+
 def create_test_data(filename: str):
     """Create a more comprehensive test dataset"""
     with pd.ExcelWriter(filename, engine='openpyxl') as writer: